@@ -4,6 +4,7 @@ import pyglet
 
 import sys
 import os
+import optparse
 from game import Game
 
 def setUpResources():
@@ -22,7 +23,46 @@ setUpResources()
 
 
 def main():
-    game = Game()
-    if len(sys.argv) > 1:
-        game.filename = sys.argv[1]
+    parser = optparse.OptionParser(usage='%prog [options] [enemy.json [enemy.json]]')
+    parser.add_option('--record', metavar='FILE',
+        help='record the inputs of the match to FILE so that it can be replayed')
+    parser.add_option('--replay', metavar='FILE',
+        help='re-run a recorded match without a window and check it for desyncs')
+    parser.add_option('--seek', metavar='TICK', type='int',
+        help='when replaying, jump to TICK before playing the rest of the match')
+    parser.add_option('--lookahead', action='store_true',
+        help='drive enemies with the lookahead AI (such matches cannot be recorded)')
+    parser.add_option('--versus', metavar='SIDE', type='int',
+        help='play a two player match as SIDE (1 or 2) against another process, '
+             'with the monster designed in the first argument')
+    parser.add_option('--peer', metavar='HOST', default='127.0.0.1',
+        help='with --versus, the host the other player is on (default: %default)')
+    parser.add_option('--port', metavar='PORT', type='int',
+        help='with --versus, side 1 uses PORT and side 2 PORT + 1')
+    parser.add_option('--seed', metavar='SEED', type='int', default=0,
+        help='with --versus, the match seed, which both players must share')
+    options, args = parser.parse_args()
+    if options.lookahead and options.record:
+        parser.error('matches using --lookahead cannot be recorded')
+
+    if options.versus is not None:
+        if options.versus not in (1, 2):
+            parser.error('--versus takes 1 or 2')
+        if options.record or options.replay or options.lookahead:
+            parser.error('--versus cannot be combined with --record, --replay or --lookahead')
+        from .netplay import play_versus, PORT
+        play_versus(options.versus - 1, options.peer, options.port or PORT, options.seed,
+                    args[0] if args else None)
+        return
+
+    if options.replay:
+        from .playback import play
+        sys.exit(0 if play(options.replay, seek=options.seek) else 1)
+
+    game = Game(record_file=options.record)
+    if args:
+        game.filename = args[0]
+    if options.lookahead:
+        from .lookahead import LookaheadController
+        game.enemy_controller = LookaheadController
     game.start()
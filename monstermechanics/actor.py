@@ -28,22 +28,38 @@ def load_resource(resource_file):
     return definition
 
 
+# Definitions returned by load_resource(), by resource file. These are never
+# modified once loaded, so they are shared by every world.
+_resource_cache = {}
+
+
+def get_resource(resource_file):
+    """Return the definition for resource_file, loading it only once."""
+    try:
+        return _resource_cache[resource_file]
+    except KeyError:
+        definition = _resource_cache[resource_file] = load_resource(resource_file)
+        return definition
+
+
 class Actor(object):
     """Base class for objects that appear in and possibly interact with the world"""
     @classmethod
     def load(cls):
-        if hasattr(cls, 'resources') or not hasattr(cls, 'RESOURCES'):
+        """Load the resources of the class, if they are not already loaded."""
+        if 'resources' in cls.__dict__ or not hasattr(cls, 'RESOURCES'):
             return
-        cls.resources = {}
-        for name, resource_file in cls.RESOURCES.items():
-            cls.resources[name] = load_resource(resource_file)
+        cls.resources = dict(
+            (name, get_resource(resource_file))
+            for name, resource_file in cls.RESOURCES.items()
+        )
 
     def __init__(self, pos, name='player'):
         self.sprite = None
         self.name = name
         self.body = None
-        self.set_default_part()
         self.scale = 1.0
+        self.set_default_part()
         self.set_position(pos)
         self._joints = []
 
@@ -51,7 +67,7 @@ class Actor(object):
         self.set_part(self.DEFAULT_PART)
 
     def set_part(self, name):
-        if self.name == 'enemy':
+        if self.name and self.name != 'player':
             qname = 'enemy-' + name
         else:
             qname = name
@@ -62,6 +78,7 @@ class Actor(object):
             self.part = self.resources[name]
 
         self.sprite = pyglet.sprite.Sprite(self.part['img'])
+        self.sprite.scale = self.scale
         if self.body:
             self.body.set_shapes(self.part['shapes'])
             self.sprite.position = self.body.get_position()
@@ -102,8 +119,27 @@ class Actor(object):
         else:
             self.sprite.position = pos
 
+    def translate(self, offset):
+        """Move the actor by offset."""
+        self.set_position(self.get_position() + offset)
+
     def create_body(self, world):
         """Create the physics body for the part"""
         #print "Spawning", self.__class__.__name__, self.name + self.type
-        self.body = world.create_body(self.get_shapes(), collision_class=self.name + self.type)
+        self.set_body(world.create_body(*self.get_body_def()))
+
+    # Attributes captured by World.snapshot(), besides the physics state
+    SNAPSHOT_ATTRS = ()
+
+    # Whether the body can be created with the bodies of other actors, in
+    # World.spawn_many(), rather than by calling create_body()
+    BATCH_BODY = True
+
+    def get_body_def(self):
+        """Return the shapes and collision class of the physics body."""
+        return self.get_shapes(), self.name + self.type
+
+    def set_body(self, body):
+        """Take ownership of a newly created physics body."""
+        self.body = body
         self.body.set_position(v(*self.sprite.position))
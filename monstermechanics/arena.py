@@ -0,0 +1,103 @@
+"""Headless fights, many to a process.
+
+An Arena is a World with some AI controlled monsters in it, that runs without
+a window until one team is left or its time runs out. Worlds share nothing
+but the loaded resources, so an ArenaManager can step any number of arenas
+side by side, one tick each in turn, for batch simulation.
+
+"""
+from __future__ import division, print_function
+
+import copy
+import time
+
+from .world import World
+from .monster import Monster
+from .controller import AIController
+
+# Length of a tick in seconds
+DT = 1 / 60
+
+# Seconds an arena may run before the fight is called off
+TIME_LIMIT = 120
+
+
+def translated(design, x):
+    """Return a copy of the monster design moved so that its head is at x."""
+    js = copy.deepcopy(design)
+    dx = x - js['parts'][0]['position'][0]
+    for p in js['parts']:
+        p['position'] = [p['position'][0] + dx, p['position'][1]]
+    return js
+
+
+class Arena(object):
+    """A fight between monsters, independent of any other arena."""
+    def __init__(self, name, seed=None, time_limit=TIME_LIMIT):
+        self.name = name
+        self.world = World(seed)
+        self.ticks = 0
+        self.elapsed = 0
+        self.done = False
+        self.winner = None
+        self.world.timers.set_timer(self.time_up, time_limit)
+
+    def add_monster(self, design, x, team, controller=AIController):
+        """Add an AI controlled monster built from design to the fight."""
+        m = Monster.from_json(self.world, translated(design, x), team)
+        m.set_controller(controller(self.world, m, team))
+        self.world.add_monster(m)
+        return m
+
+    def time_up(self):
+        self.done = True
+
+    def step(self, dt=DT):
+        start = time.time()
+        self.world.update(dt)
+        self.elapsed += time.time() - start
+        self.ticks += 1
+        teams = self.world.teams
+        if len(teams) <= 1:
+            self.done = True
+            self.winner = next(iter(teams), None)
+
+    def get_rate(self):
+        """Return the number of ticks simulated per second of wall clock time."""
+        if self.elapsed <= 0:
+            return float('inf')
+        return self.ticks / self.elapsed
+
+
+class ArenaManager(object):
+    """Steps a number of arenas round-robin until they are all finished."""
+    def __init__(self, arenas=()):
+        self.arenas = list(arenas)
+
+    def add(self, arena):
+        self.arenas.append(arena)
+
+    def step(self, dt=DT):
+        """Step every unfinished arena by one tick; return how many remain."""
+        running = 0
+        for a in self.arenas:
+            if not a.done:
+                a.step(dt)
+                running += not a.done
+        return running
+
+    def run(self, dt=DT):
+        """Run every arena to the end; return the total ticks per second."""
+        start = time.time()
+        while self.step(dt):
+            pass
+        elapsed = time.time() - start
+        ticks = sum(a.ticks for a in self.arenas)
+        return ticks / elapsed if elapsed > 0 else float('inf')
+
+    def report(self):
+        """Return a list of lines describing each arena's result and throughput."""
+        lines = ['%-12s %8s %12s  %s' % ('arena', 'ticks', 'ticks/s', 'winner')]
+        for a in self.arenas:
+            lines.append('%-12s %8d %12.0f  %s' % (a.name, a.ticks, a.get_rate(), a.winner or '-'))
+        return lines
@@ -17,7 +17,13 @@ class Background(object):
     def set_scroll(self, v):
         self.scroll = v 
 
-    def draw(self, viewport):
+    def draw(self, viewport, origin=0):
+        """Draw the background visible in viewport.
+
+        origin is the world's origin (see World.recenter()), so that the
+        background scrolls continuously when the world is recentred.
+
+        """
         gl.glClearColor(183 / 255.0, 196 / 255.0, 200 / 255.0, 1)
         gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
         gl.glEnable(gl.GL_BLEND)
@@ -32,7 +38,7 @@ class Background(object):
         ]
 
         for img, w in backgrounds:
-            cx = x1 - x1 % w - w
+            cx = x1 - (x1 + origin) % w - w
             while cx < x2:
                 img.blit(cx, 0)
                 cx += w
@@ -4,15 +4,20 @@ from Box2D import *
 from .physics import *
 from vector import v
 import math
+import itertools
+import weakref
 
 
-def make_bitmasks():
+def make_bitmasks(teams=TEAMS):
+    collision_classes = team_collision_classes(teams)
+    if len(collision_classes) > 16:
+        raise ValueError("Too many teams for 16 collision bits.")
     namebits = {}
-    for bit, (name, collideswith) in enumerate(COLLISION_CLASSES):
+    for bit, (name, collideswith) in enumerate(collision_classes):
         namebits[name] = 1 << bit
 
     classes = {}
-    for name, collideswith in COLLISION_CLASSES:
+    for name, collideswith in collision_classes:
         mask = 0
         for c in collideswith:
             mask |= namebits[c]
@@ -31,18 +36,42 @@ PHYSICS_HEIGHT = 2500
 
 
 class Box2DPhysics(AbstractPhysics):
-    def create_world(self, gravity):
-        world_bounds = b2AABB()
-        bound = v(PHYSICS_WIDTH, PHYSICS_HEIGHT)
-        world_bounds.lowerBound = bound * -0.5
-        world_bounds.upperBound = bound * 0.5
-        return Box2DWorld(b2World(world_bounds, gravity * SCALE, True))
+    def create_world(self, gravity, step=None):
+        def new_world():
+            world_bounds = b2AABB()
+            bound = v(PHYSICS_WIDTH, PHYSICS_HEIGHT)
+            world_bounds.lowerBound = bound * -0.5
+            world_bounds.upperBound = bound * 0.5
+            return b2World(world_bounds, gravity * SCALE, True)
+        return Box2DWorld(new_world, step)
 
 
 class Box2DWorld(AbstractWorld):
-    def __init__(self, world):
-        self.world = world
+    def __init__(self, new_world, step=None):
+        # new_world() creates an empty b2World; see reset()
+        self.new_world = new_world
+        self.world = new_world()
         self.update_callbacks = []
+        # Every live body by creation order, so that they can all be moved by
+        # shift_origin() in the same order every time; weak so as not to keep
+        # the bodies of a discarded world alive
+        self.bodies = weakref.WeakValueDictionary()
+        self.body_seq = itertools.count()
+        # With a fixed step, the world is only ever stepped by exactly step
+        # seconds, and any remainder is carried over to the next update
+        self.step = step
+        self.accumulator = 0
+
+    def add_body(self, body):
+        body.seq = next(self.body_seq)
+        self.bodies[body.seq] = body
+
+    def discard_body(self, body):
+        self.bodies.pop(getattr(body, 'seq', None), None)
+
+    def get_bodies(self):
+        """Return the live bodies in the order they were created."""
+        return [b for seq, b in sorted(self.bodies.items())]
 
     def add_update_callback(self, c):
         self.update_callbacks.append(c)
@@ -53,9 +82,18 @@ class Box2DWorld(AbstractWorld):
                 c(dt)
             except AttributeError:
                 self.update_callbacks.remove(c)
-        self.world.Step(dt, 10, 8)
+        if self.step is None:
+            self.world.Step(dt, 10, 8)
+            self.steps += 1
+            return
+        self.accumulator += dt
+        while self.accumulator >= self.step:
+            self.world.Step(self.step, 10, 8)
+            self.steps += 1
+            self.accumulator -= self.step
 
     def create_ground(self, y):
+        self.ground_y = y
         ground = self.world.GetGroundBody()
 
         groundshape = b2PolygonDef()
@@ -69,6 +107,101 @@ class Box2DWorld(AbstractWorld):
     def create_body(self, circles, density=0.00001, restitution=0.1, friction=0.5, collision_class=None):
         return Box2DBody(self, circles, density, restitution, friction, collision_class=collision_class)
 
+    def create_bodies(self, defs, density=0.00001, restitution=0.1, friction=0.5):
+        bodies = [
+            Box2DBody(self, circles, density, restitution, friction, collision_class=cc, compute_mass=False)
+            for circles, cc in defs
+        ]
+        for b in bodies:
+            b.compute_mass()
+        return bodies
+
+    def restore_joints(self, joints):
+        js = [b1.restore_joint(b2, j, register=False) for b1, b2, j in joints]
+        self.update_callbacks.extend(j.update for j in js)
+        return js
+
+    def get_sleeping_fraction(self):
+        bodies = self.get_bodies()
+        if not bodies:
+            return 0.0
+        return sum(1 for b in bodies if b.is_sleeping()) / float(len(bodies))
+
+    def shift_origin(self, offset):
+        for b in self.get_bodies():
+            b.set_position(b.get_position() + offset)
+
+    def reset(self, bodies, joints):
+        """Replace the b2World with a new one holding the same bodies and joints.
+
+        The Box2DBody and StiffJoint objects are kept, and given new Box2D
+        bodies and joints with the same state, created in the order given,
+        followed by any others. Everything else Box2D keeps - contacts and
+        their impulses, sleep timers, the broad-phase - starts afresh, so the
+        new world depends only on the bodies' and joints' own state.
+
+        """
+        listed = set(bodies)
+        bodies = list(bodies) + [b for b in self.get_bodies() if b not in listed]
+        listed = set(joints)
+        joints = list(joints)
+        for b in bodies:
+            for j in b.joints:
+                if j not in listed:
+                    listed.add(j)
+                    joints.append(j)
+
+        states = [b.get_state() for b in bodies]
+        # The old world frees its bodies and joints when it is dropped
+        for j in joints:
+            j.joint = None
+        for b in bodies:
+            b.body = None
+        self.ground.body = None
+        self.world = self.new_world()
+        self.create_ground(self.ground_y)
+
+        self.bodies = weakref.WeakValueDictionary()
+        self.body_seq = itertools.count()
+        for b, state in zip(bodies, states):
+            b.recreate(state)
+            self.add_body(b)
+        for j in joints:
+            j.recreate()
+        self.update_callbacks = [
+            c for c in self.update_callbacks
+            if getattr(c, '__self__', None) not in listed
+        ] + [j.update for j in joints]
+
+    def destroy_bodies(self, bodies):
+        doomed = set(bodies)
+        # A list rather than a set, so that joints are always destroyed in
+        # the same order
+        joints = []
+        seen = set()
+        for b in bodies:
+            for j in b.joints:
+                if j not in seen:
+                    seen.add(j)
+                    joints.append(j)
+        for j in joints:
+            if j.joint is not None:
+                self.world.DestroyJoint(j.joint)
+                j.joint = None
+            for b in (j.body1, j.body2):
+                if b not in doomed:
+                    b.joints = [bj for bj in b.joints if bj.joint is not None]
+        self.update_callbacks = [
+            c for c in self.update_callbacks
+            if getattr(c, '__self__', None) not in seen
+        ]
+        for b in bodies:
+            b.joints = []
+            self.discard_body(b)
+            if b.body is not None:
+                self.world.DestroyBody(b.body)
+                b.body = None
+
 
 class Box2DGround(AbstractBody):
     def __init__(self, world, body):
@@ -99,7 +232,7 @@ class Box2DGround(AbstractBody):
 
 
 class Box2DBody(AbstractBody):
-    def __init__(self, world, circles, density=1, restitution=0.1, friction=1, collision_class=None):
+    def __init__(self, world, circles, density=1, restitution=0.1, friction=1, collision_class=None, compute_mass=True):
         self.world = world
         self.circles = circles
         self.density = density
@@ -116,7 +249,38 @@ class Box2DBody(AbstractBody):
 
         bodydef = b2BodyDef()
         self.body = self.world.world.CreateBody(bodydef)
+        self.world.add_body(self)
+        self.create_shapes()
+        if compute_mass:
+            self.compute_mass()
+
+    def get_state(self):
+        """Return the state of the Box2D body, for recreate()."""
+        b = self.body
+        m = b.massData
+        return (
+            tuple(b.position), b.angle, tuple(b.linearVelocity), b.angularVelocity,
+            (m.mass, tuple(m.center), m.I),
+        )
+
+    def recreate(self, state):
+        """Create a new Box2D body with the state from get_state(), in the current b2World."""
+        position, angle, velocity, angular_velocity, (mass, center, I) = state
+        bodydef = b2BodyDef()
+        bodydef.position = position
+        bodydef.angle = angle
+        self.body = self.world.world.CreateBody(bodydef)
         self.create_shapes()
+        massdata = b2MassData()
+        massdata.mass = mass
+        massdata.center = center
+        massdata.I = I
+        self.body.massData = massdata
+        self.body.linearVelocity = velocity
+        self.body.angularVelocity = angular_velocity
+
+    def compute_mass(self):
+        """Compute the mass of the body from its shapes."""
         self.body.SetMassFromShapes()
         self.origMassData = self.body.massData
 
@@ -151,6 +315,7 @@ class Box2DBody(AbstractBody):
             j.rescale()
 
     def remove(self):
+        self.world.discard_body(self)
         self.world.world.DestroyBody(self.body)
 
     def get_position(self):
@@ -171,6 +336,15 @@ class Box2DBody(AbstractBody):
     def set_velocity(self, vel):
         self.body.linearVelocity = vel * SCALE
 
+    def get_velocity(self):
+        return v(*self.body.linearVelocity) / SCALE
+
+    def get_angular_velocity(self):
+        return self.body.angularVelocity
+
+    def set_angular_velocity(self, vel):
+        self.body.angularVelocity = vel
+
     def apply_force(self, force, point):
         self.body.ApplyForce(force * SCALE, point * SCALE)
 
@@ -180,6 +354,9 @@ class Box2DBody(AbstractBody):
     def apply_torque(self, torque):
         self.body.ApplyTorque(torque)
 
+    def is_sleeping(self):
+        return self.body.IsSleeping()
+
     def attach(self, another, anchor_point):
         localanchor1 = anchor_point * SCALE - v(*self.body.GetPosition())
         localanchor2 = anchor_point * SCALE - v(*another.body.GetPosition())
@@ -187,10 +364,10 @@ class Box2DBody(AbstractBody):
         localanchor2 = localanchor2.rotated(-another.body.angle / math.pi * 180)
         return self._create_joint(another, localanchor1, localanchor2, angle=0)
 
-    def restore_joint(self, another, js):
-        return self._create_joint(another, v(*js['anchor1']) * SCALE, v(*js['anchor2']) * SCALE, js['angle'], js['refAngle'])
+    def restore_joint(self, another, js, register=True):
+        return self._create_joint(another, v(*js['anchor1']) * SCALE, v(*js['anchor2']) * SCALE, js['angle'], js['refAngle'], register=register)
 
-    def _create_joint(self, another, localanchor1, localanchor2, angle, refangle=None):
+    def _create_joint(self, another, localanchor1, localanchor2, angle, refangle=None, register=True):
         joint = b2RevoluteJointDef()
         joint.maxMotorTorque = 1
         joint.motorSpeed = 0
@@ -206,12 +383,15 @@ class Box2DBody(AbstractBody):
         j = StiffJoint(self.world, joint, self, another)
         self.joints.append(j)
         another.joints.append(j)
-        self.world.add_update_callback(j.update)
+        if register:
+            self.world.add_update_callback(j.update)
         return j
 
     def destroy(self):
-        for j in self.joints:
+        # StiffJoint.destroy() removes the joint from self.joints
+        for j in self.joints[:]:
             j.destroy()
+        self.world.discard_body(self)
         if self.body is not None:
             self.world.world.DestroyBody(self.body)
             self.body = None
@@ -221,6 +401,12 @@ class Box2DBody(AbstractBody):
 
 class StiffJoint(object):
     """Control for the motor of a revolution joint"""
+    # Setting the motor speed wakes the bodies, so it is only changed by more
+    # than this
+    MOTOR_THRESHOLD = 0.01
+
+    motor_speed = 0
+
     def __init__(self, world, jointdef, body1, body2):
         self.jointdef = jointdef
         self.world = world
@@ -240,17 +426,34 @@ class StiffJoint(object):
             except AttributeError:
                 return basejoint
 
+    def recreate(self):
+        """Create a new Box2D joint between the recreated bodies."""
+        self.jointdef.body1 = self.body1.body
+        self.jointdef.body2 = self.body2.body
+        self.joint = self.make_joint(self.jointdef)
+        if self.motor_speed:
+            self.joint.SetMotorSpeed(self.motor_speed)
+
     def rescale(self):
         """Reposition the joint anchors to match the bodys' current scale"""
         self.world.world.DestroyJoint(self.joint)
         self.jointdef.localAnchor1 = self.b1_anchor * self.body1.scale
         self.jointdef.localAnchor2 = self.b2_anchor * self.body2.scale
         self.joint = self.make_joint(self.jointdef)
+        self.motor_speed = self.jointdef.motorSpeed
 
     def update(self, dt):
+        if self.body1.is_sleeping() and self.body2.is_sleeping():
+            return
         angleError = self.joint.GetJointAngle()
         gain = 1
-        self.joint.SetMotorSpeed(-gain * angleError)
+        speed = -gain * angleError
+        if abs(speed - self.motor_speed) >= self.MOTOR_THRESHOLD:
+            self.set_motor_speed(speed)
+
+    def set_motor_speed(self, speed):
+        self.motor_speed = speed
+        self.joint.SetMotorSpeed(speed)
 
     def destroy(self):
         if self.joint is not None:
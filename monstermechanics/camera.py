@@ -5,6 +5,9 @@ from .geom import Rect
 
 MARGIN = 120
 
+# The camera keeps the player and any monsters within this distance in view
+FOCUS_RADIUS = 1200
+
 class Camera(object):
     def __init__(self, center, viewport_width, viewport_height):
         self.center = center
@@ -14,6 +17,16 @@ class Camera(object):
         self.scale = 1
         self.target = None 
         self.target_scale = 1
+        # The world origin the camera's coordinates are relative to
+        self.origin = 0
+
+    def set_origin(self, origin):
+        """Follow the world when it is recentred to a new origin."""
+        offset = v(self.origin - origin, 0)
+        self.center += offset
+        if self.target is not None:
+            self.target += offset
+        self.origin = origin
 
     def track_bounds(self, bounds):
         br = v(bounds.br.x, 0)
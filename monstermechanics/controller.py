@@ -1,53 +1,95 @@
-import random
+# Number of times per second that an AIController reconsiders what to do
+DECISION_RATE = 10
+
+# Spreads the decisions of successive controllers over the decision interval
+PHASE_STEP = 0.618034
 
 
 class AIController(object):
-    def __init__(self, world, monster, name='enemy'):
+    """Drives a monster.
+
+    Decisions, such as picking a target or a strategy, are made DECISION_RATE
+    times per second; in between, the monster keeps steering according to the
+    last decision. Controllers in the same world are given staggered phases
+    so that their decisions do not all fall on the same tick.
+
+    """
+    def __init__(self, world, monster, name='enemy', rate=DECISION_RATE):
         self.world = world
         self.monster = monster
         self.name = name
         self.target = None
         self.strategy = None
         self.time = 0
+        self.interval = 1.0 / rate
+        self.countdown = (world.ai_count * PHASE_STEP) % 1.0 * self.interval
+        world.ai_count += 1
+
+        # The last decision: the direction to move in (-1, 0 or 1), and
+        # whether to attack
+        self.move = 0
+        self.attacking = False
+        self.monster_x = None
+        self.enemy_x = None
 
     def pick_target(self):
-        try:
-            self.target = self.world.get_enemies_for_name(self.name)[0]
-        except IndexError:
+        """Target the nearest enemy."""
+        enemies = self.world.get_enemies_for_name(self.name)
+        if not enemies:
             self.target = None
+            return
+        x = self.monster.get_position().x
+        self.target = min(enemies, key=lambda m: abs(m.get_position().x - x))
 
     def get_monster_x(self):
-        return self.monster.get_position().x
+        return self.monster_x
 
     def get_enemy_x(self):
-        return self.target.get_position().x
+        return self.enemy_x
+
+    def get_distance(self):
+        return abs(self.monster_x - self.enemy_x)
 
     def towards(self):
-        if self.get_monster_x() < self.get_enemy_x():
-            self.monster.right()
-        else:
-            self.monster.left()
+        return 1 if self.monster_x < self.enemy_x else -1
 
     def away(self):
-        if self.get_monster_x() > self.get_enemy_x():
-            self.monster.right()
-        else:
-            self.monster.left()
+        return 1 if self.monster_x > self.enemy_x else -1
 
     def update(self, dt):
-        self.time += 0
-        if self.target and not self.target.dead:
-            if self.strategy is None:
-                self.pick_strategy()
-            else:
-                self.strategy.update()
-            self.monster.attack()
-        else:
+        self.time += dt
+        self.countdown -= dt
+        if self.countdown <= 0:
+            self.countdown = max(self.countdown + self.interval, 0)
+            self.decide()
+        self.steer()
+
+    def decide(self):
+        """Reconsider what to do, given the current positions."""
+        if self.target is None or self.target.dead:
             self.strategy = None
+            self.move = 0
+            self.attacking = False
             self.pick_target()
+            return
+        self.monster_x = self.monster.get_position().x
+        self.enemy_x = self.target.get_position().x
+        if self.strategy is None:
+            self.pick_strategy()
+        self.move = self.strategy.decide()
+        self.attacking = True
+
+    def steer(self):
+        """Act on the last decision."""
+        if self.move > 0:
+            self.monster.right()
+        elif self.move < 0:
+            self.monster.left()
+        if self.attacking:
+            self.monster.attack()
 
     def pick_strategy(self):
-        strat = random.choice([AdvanceStrategy, RetreatStrategy])
+        strat = self.world.random.choice([AdvanceStrategy, RetreatStrategy])
         self.strategy = strat(self)
 
 
@@ -56,12 +98,12 @@ class AdvanceStrategy(object):
         self.controller = controller
         self.monster = controller.monster
 
-    def update(self):
-        dist = abs(self.controller.get_monster_x() - self.controller.get_enemy_x())
-        if dist > 100:
-            self.controller.towards()
-        else:
-            self.controller.strategy = None
+    def decide(self):
+        """Return the direction to move in."""
+        if self.controller.get_distance() > 100:
+            return self.controller.towards()
+        self.controller.strategy = None
+        return 0
 
 
 class RetreatStrategy(object):
@@ -70,9 +112,11 @@ class RetreatStrategy(object):
         self.monster = controller.monster
         self.start = self.controller.time
 
-    def update(self):
-        dist = abs(self.controller.get_monster_x() - self.controller.get_enemy_x())
-        if dist < 600:
-            self.controller.away()
+    def decide(self):
+        """Return the direction to move in."""
+        move = 0
+        if self.controller.get_distance() < 600:
+            move = self.controller.away()
         if self.controller.time - self.start > 2:
             self.controller.strategy = None
+        return move
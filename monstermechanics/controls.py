@@ -0,0 +1,20 @@
+"""The controls the player drives their monster with.
+
+Each is the index of a flag in Game.control_state, and of a bit in the packed
+controls stored in recordings and sent between players.
+
+"""
+
+
+class Control:
+    MoveLeft = 0
+    MoveRight = 1
+    MoveUp = 2
+    MoveDown = 3
+    Rotate1 = 4
+    Rotate2 = 5
+    Rotate3 = 6
+    Rotate4 = 7
+    Rotate5 = 8
+    Rotate6 = 9
+    Attack = 10
@@ -80,6 +80,9 @@ class DigitsActor(object):
     def get_shapes(self):
         return []
 
+    def translate(self, offset):
+        self.digits.pos += offset
+
     def draw(self):
         self.digits.draw()
 
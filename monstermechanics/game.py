@@ -1,6 +1,7 @@
 from __future__ import division, print_function, unicode_literals; range = xrange
 
 import random
+import json
 import os
 import os.path
 import pyglet
@@ -10,11 +11,14 @@ from vector import v
 from .physics import get_physics
 
 from .controller import AIController
-from .camera import Camera
+from .camera import Camera, FOCUS_RADIUS
 from .hud import Shelf
-from .monster import Monster, LEFT, RIGHT
+from .monster import Monster, PART_CLASSES, LEFT, RIGHT
 from .background import Background
 from .world import World
+from .replay import Recorder, tick_seed, KEYFRAME_INTERVAL
+from .timers import Scheduler
+from .controls import Control
 
 import math
 
@@ -23,22 +27,8 @@ name = "Monster Mechanics"
 target_fps = 60
 
 
-class Control:
-    MoveLeft = 0
-    MoveRight = 1
-    MoveUp = 2
-    MoveDown = 3
-    Rotate1 = 4
-    Rotate2 = 5
-    Rotate3 = 6
-    Rotate4 = 7
-    Rotate5 = 8
-    Rotate6 = 9
-    Attack = 10
-
-
 class Game(object):
-    def __init__(self, width=853, height=480, show_fps=False):
+    def __init__(self, width=853, height=480, show_fps=False, record_file=None):
         self.size = v(width, height)
         self.show_fps = show_fps
 
@@ -68,35 +58,67 @@ class Game(object):
         self.own_enemies = False
         self.camera = None
         self.message = None
-
-        self.timers = []
+        self.loaded_images = {}
+
+        # Timers for the display, such as clearing messages; timers that
+        # affect the match are kept by the world
+        self.timers = Scheduler()
+
+        # The class of AIController that drives enemies
+        self.enemy_controller = AIController
+
+        # Every tick reseeds the world's random number generator from this, so
+        # that a match can be replayed exactly from a recording of its inputs
+        self.seed = random.randrange(1 << 32)
+        self.tick = 0
+        # The world is canonicalized every this many ticks, so that playback
+        # can jump to those ticks and carry on exactly
+        self.keyframe_interval = KEYFRAME_INTERVAL
+        self.record_file = record_file
+        self.recorder = None
+        # Changes the player has made to their monster with the HUD since the
+        # last tick, as (kind, details); see apply_edits()
+        self.edits = []
 
     def getNextGroupNum(self):
         val = self.next_group_num
         self.next_group_num += 1
         return val
         
-    def set_timer(self, callback, duration):
-        self.timers.append((callback, duration))
+    def set_timer(self, callback, duration, interval=None):
+        """Call callback after duration seconds of the match."""
+        return self.world.timers.set_timer(callback, duration, interval)
 
     def unset_timer(self, callback):
-        ts = []
-        for c, duration in self.timers:
-            if c is not callback:
-                ts.append((c, duration))
-        self.timers = ts
+        self.world.timers.unset_timer(callback)
 
     def update_timers(self, dt):
-        ts = []
-        for callback, duration in self.timers:
-            duration -= dt
-            if duration <= 0:
-                callback()
-            else:
-                ts.append((callback, duration))
-        self.timers = ts
+        self.timers.advance(dt)
+        for callback in self.timers.due():
+            if self.recorder:
+                self.recorder.record_event(callback.__name__)
+            callback()
     
     def update(self, dt):
+        self.simulate(dt)
+        self.camera.set_origin(self.world.origin)
+        self.hud.update(dt)
+        self.camera.track_bounds(self.world.get_monster_bounds(self.monster, FOCUS_RADIUS))
+        self.camera.update(dt)
+
+    def simulate(self, dt):
+        """Advance the match by one tick.
+
+        Everything that can affect the outcome of the match happens here, so
+        that it can be re-run without a window by playback.HeadlessGame.
+
+        """
+        if self.tick % self.keyframe_interval == 0:
+            self.world.canonicalize()
+        self.world.random.seed(tick_seed(self.seed, self.tick))
+        if self.recorder:
+            self.recorder.begin_tick(self.tick, self.control_state, dt)
+        self.apply_edits()
         self.update_timers(dt)
         if self.control_state[Control.MoveLeft]:
             self.manual_control()
@@ -111,13 +133,47 @@ class Game(object):
 
         self.monster.update(dt)
         self.world.update(dt)
-        self.hud.update(dt)
-        self.camera.track_bounds(self.world.get_monster_bounds())
-        self.camera.update(dt)
+        if self.recorder:
+            for callback in self.world.fired:
+                self.recorder.record_event(callback.__name__)
+            self.recorder.end_tick(self.world)
+        self.tick += 1
+
+    def queue_edit(self, kind, details):
+        """Queue a change to the player's monster, to be made at the start of the next tick."""
+        self.edits.append((kind, details))
+
+    def apply_edits(self):
+        edits, self.edits = self.edits, []
+        for kind, details in edits:
+            if self.recorder:
+                self.recorder.record_input(kind, json.dumps(details, sort_keys=True))
+            self.EDITS[kind](self, **details)
+
+    def attach_part(self, part, position, cost):
+        """Buy a part of the type called part, and grow it where it was dropped."""
+        part = PART_CLASSES[part](v(*position))
+        part.cost = cost
+        try:
+            self.monster.attach_and_grow(part)
+        except ValueError:
+            return
+        self.monster.spend_mutagen(cost)
+
+    def upgrade_part(self, path):
+        """Upgrade the part at path (see Monster.part_path) in the player's monster, if it can be."""
+        part = self.monster.part_at_path(path)
+        if hasattr(part, 'upgrade'):
+            part.upgrade()
+
+    EDITS = {
+        'attach': attach_part,
+        'upgrade': upgrade_part,
+    }
 
     def on_draw(self):
         self.camera.set_matrix()
-        self.background.draw(self.camera.get_viewport())
+        self.background.draw(self.camera.get_viewport(), self.world.origin)
         self.world.draw()
 
         # hud
@@ -136,31 +192,26 @@ class Game(object):
         self.unset_timer(self.auto_monster)
         self.set_timer(self.auto_monster, 2)
     
-    def start(self):
+    def open_window(self):
         Monster.load_all()
         self.window = pyglet.window.Window(width=self.size.x, height=self.size.y, caption=name)
         self.camera = Camera(v(self.size.x, self.size.y) * 0.5, self.size.x, self.size.y)
 
         Background.load()
         self.background = Background(self.window)
+        self.fps_display = pyglet.clock.ClockDisplay()
 
-        self.world = World()
-        self.monster = Monster.create_initial(self.world, v(400, 80))
-        self.monster.add_death_listener(self.show_game_over)
-        self.world.add_monster(self.monster)
-        self.auto_monster()
+    def start(self):
+        self.open_window()
 
-        if self.filename is not None:
-            self.world.add_monster(Monster.enemy_from_json(self.world, self.filename))
-            self.show_message('fight', 2)
-        else:
-            self.set_timer(self.spawn_next_enemy, 1.5)
-            self.show_message('get-ready')
+        if self.record_file is not None:
+            self.recorder = Recorder(self.seed, self.filename, open(self.record_file, 'wb'),
+                                     keyframe_interval=self.keyframe_interval)
 
-        Shelf.load()
-        self.hud = Shelf(self.world, self.monster, self.camera)
+        self.create_world()
 
-        self.fps_display = pyglet.clock.ClockDisplay()
+        Shelf.load()
+        self.hud = Shelf(self.world, self.monster, self.camera, self.queue_edit)
 
         pyglet.clock.schedule_interval(self.update, 1/target_fps)
         self.window.set_handlers(
@@ -175,8 +226,23 @@ class Game(object):
         )
 
         pyglet.app.run()
+        if self.recorder:
+            self.recorder.close()
+
+    def create_world(self):
+        """Set up the world at the start of a match."""
+        self.world = World(tick_seed(self.seed, self.tick))
+        self.monster = Monster.create_initial(self.world, v(400, 80))
+        self.monster.add_death_listener(self.show_game_over)
+        self.world.add_monster(self.monster)
+        self.auto_monster()
 
-    loaded_images = {}
+        if self.filename is not None:
+            # spawned by the first tick, so that the design is recorded
+            self.set_timer(self.spawn_chosen_enemy, 0)
+        else:
+            self.set_timer(self.spawn_next_enemy, 1.5)
+            self.show_message('get-ready')
 
     def show_game_over(self, monster):
         self.show_message('game-over')
@@ -194,24 +260,54 @@ class Game(object):
             self.loaded_images[fname] = pic
         self.message = pyglet.sprite.Sprite(pic, x=x, y=y)
         if duration is not None:
-            self.set_timer(self.clear_message, duration)
+            self.timers.set_timer(self.clear_message, duration)
 
     def clear_message(self):
         self.message = None
 
+    def read_design(self, path):
+        """Return the text of the monster design in the file at path.
+
+        The design is recorded, so that the match can be replayed even if the
+        file changes.
+
+        """
+        with open(path) as f:
+            design = f.read()
+        if self.recorder:
+            self.recorder.record_input('design', design)
+        return design
+
+    def choose_enemy(self, pick):
+        """Return the path of the next enemy's design.
+
+        pick is a random number in [0, 1) used to choose between the saved
+        monsters of the current level.
+
+        """
+        if not self.own_enemies:
+            return 'data/enemies/enemy%d.json' % self.enemy_number
+        path = os.path.join('data', 'saves', str(self.enemy_number))
+        files = sorted(f for f in os.listdir(path) if f.endswith('.json'))
+        return os.path.join(path, files[int(pick * len(files))])
+
+    def spawn_chosen_enemy(self):
+        design = json.loads(self.read_design(self.filename))
+        self.world.add_monster(Monster.enemy_from_design(self.world, design, self.enemy_controller))
+        self.show_message('fight', 2)
+
     def spawn_next_enemy(self):
+        # drawn even when it is not needed, so that the random numbers the
+        # rest of the tick uses do not depend on what is on disk
+        pick = self.world.random.random()
         try:
-            if self.own_enemies:
-                path = os.path.join('data', 'saves', str(self.enemy_number))
-                f = random.choice(os.listdir(path))
-                monster = Monster.enemy_from_json(self.world, os.path.join(path, f))
-            else:
-                monster = Monster.enemy_from_json(self.world, 'data/enemies/enemy%d.json' % self.enemy_number)
-        except IOError:
+            design = json.loads(self.read_design(self.choose_enemy(pick)))
+        except (IOError, OSError):
             self.show_message('congratulations')
             self.own_enemies = True
             self.enemy_number = 1
         else:
+            monster = Monster.enemy_from_design(self.world, design, self.enemy_controller)
             monster.add_death_listener(self.on_enemy_death)
             self.world.add_monster(monster)
             self.enemy_number += 1
@@ -224,7 +320,6 @@ class Game(object):
         self.set_timer(self.spawn_next_enemy, 5)
 
     def save(self):
-        import json
         from hashlib import md5
         from .screenshot import take_screenshot
         js = json.dumps(self.monster.to_json(), indent=2)
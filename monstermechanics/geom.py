@@ -10,6 +10,11 @@ class Rect(object):
         self.tl = tl
         self.br = br
 
+    @classmethod
+    def from_bounds(cls, lo, hi):
+        """Create a Rect from its lower left and upper right corners."""
+        return cls(v(lo.x, hi.y), v(hi.x, lo.y))
+
     def union(self, ano):
         l, t = self.tl
         al, at = ano.tl
@@ -34,3 +39,39 @@ class Rect(object):
     def __repr__(self):
         return 'Rect(%r, %r)' % (self.tl, self.br)
     __str__ = __repr__
+
+
+class Bounds(object):
+    """A bounding box that is grown in place.
+
+    This avoids allocating a new Rect for each union when combining many
+    bounding boxes.
+
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.l = self.b = float('inf')
+        self.r = self.t = float('-inf')
+
+    def add_rect(self, rect):
+        l, t = rect.tl
+        r, b = rect.br
+        if l < self.l:
+            self.l = l
+        if b < self.b:
+            self.b = b
+        if r > self.r:
+            self.r = r
+        if t > self.t:
+            self.t = t
+
+    def is_empty(self):
+        return self.l > self.r
+
+    def rect(self):
+        """Return the bounds as a Rect, or None if nothing has been added."""
+        if self.is_empty():
+            return None
+        return Rect(v(self.l, self.t), v(self.r, self.b))
@@ -0,0 +1,133 @@
+"""Bounding circle hierarchy over the parts of a monster.
+
+Monsters are trees of parts, rooted at the head, in which each part knows the
+part it is attached to (_parent) and the parts attached to it (_joints). The
+hierarchy follows this tree: each node bounds one part's circles, and every
+part attached to it, directly or indirectly. Queries against a monster can
+then reject a distant monster, or a far-away limb, after a test or two.
+
+The hierarchy is refitted at most once per world tick, the first time it is
+queried.
+
+"""
+import math
+
+# Slack in the rejection tests, so that rounding in enclose() can never reject
+# a circle that the exact test would accept
+EPSILON = 1e-6
+
+
+def enclose(a, b):
+    """Return the smallest circle (x, y, r) enclosing circles a and b."""
+    ax, ay, ar = a
+    bx, by, br = b
+    dx = bx - ax
+    dy = by - ay
+    d = math.sqrt(dx * dx + dy * dy)
+    if d + br <= ar:
+        return a
+    if d + ar <= br:
+        return b
+    r = (d + ar + br) * 0.5
+    f = (r - ar) / d
+    return ax + dx * f, ay + dy * f, r
+
+
+class Node(object):
+    __slots__ = ['part', 'circles', 'own', 'bound', 'children']
+
+    def __init__(self, part, circles, own, children):
+        self.part = part
+        # (x, y, radius, subpart) for each circle of the part
+        self.circles = circles
+        # circle bounding the part itself
+        self.own = own
+        # circle bounding the part and everything attached to it
+        self.bound = own
+        self.children = children
+
+
+class PartTree(object):
+    """Bounding circle hierarchy over the parts of a monster."""
+    def __init__(self, monster):
+        self.monster = monster
+        self.roots = []
+        self.nodes = []
+        self.tick = None
+        # Incremented on every refit, so that indexes built from the nodes
+        # can tell when they are out of date
+        self.version = 0
+
+    def invalidate(self):
+        """Force a refit at the next query, eg. because parts were added."""
+        self.tick = None
+
+    def build_node(self, part, children):
+        circles = []
+        for sp in part.subparts():
+            px, py = sp.get_position()
+            for (cx, cy), r in sp.get_shapes():
+                circles.append((cx + px, cy + py, r, sp))
+        x, y, r, sp = circles[0]
+        own = x, y, r
+        for x, y, r, sp in circles[1:]:
+            own = enclose(own, (x, y, r))
+        return Node(part, circles, own, children)
+
+    def refit(self):
+        """Recompute the hierarchy if the world has stepped since the last refit."""
+        tick = self.monster.world.tick
+        if tick == self.tick:
+            return
+        self.tick = tick
+        self.version += 1
+
+        parts = self.monster.parts
+        # Walk the tree from the roots, so that a part's children are always
+        # visited after it. Parts not reachable from a root become roots.
+        order = []
+        roots = []
+        walked_from = {}
+        for root in [p for p in parts if p._parent is None] + parts:
+            if root in walked_from:
+                continue
+            walked_from[root] = None
+            roots.append(root)
+            stack = [root]
+            while stack:
+                p = stack.pop()
+                order.append(p)
+                for c, j in p._joints:
+                    if c not in walked_from:
+                        walked_from[c] = p
+                        stack.append(c)
+
+        nodes = {}
+        for p in reversed(order):
+            children = [nodes[c] for c, j in p._joints if walked_from.get(c) is p]
+            node = self.build_node(p, children)
+            for c in children:
+                node.bound = enclose(node.bound, c.bound)
+            nodes[p] = node
+        self.roots = [nodes[p] for p in roots]
+        self.nodes = list(nodes.values())
+
+    def candidates(self, x, y, radius):
+        """Generate the nodes whose own circle is within radius of (x, y)."""
+        self.refit()
+        stack = list(self.roots)
+        while stack:
+            node = stack.pop()
+            bx, by, br = node.bound
+            reach = br + radius + EPSILON
+            dx = x - bx
+            dy = y - by
+            if dx * dx + dy * dy >= reach * reach:
+                continue
+            ox, oy, orad = node.own
+            reach = orad + radius + EPSILON
+            dx = x - ox
+            dy = y - oy
+            if dx * dx + dy * dy < reach * reach:
+                yield node
+            stack.extend(node.children)
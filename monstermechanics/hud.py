@@ -7,6 +7,7 @@ from geom import Rect
 
 from .monster import *
 from .digits import Digits
+from .spatial import SpatialHash
 
 
 ICON_HEIGHT = 64
@@ -129,10 +130,13 @@ class Shelf(object):
         cls.cost_label.position = v(200, 443)
         cls.images = imgs
 
-    def __init__(self, world, monster, camera):
+    def __init__(self, world, monster, camera, edit):
         self.world = world
         self.monster = monster
         self.camera = camera
+        # Called with (kind, details) to change the monster; see
+        # Game.queue_edit()
+        self.edit = edit
         self.icons = {}
         self.init_icons()
         self.scroll_y = 0
@@ -145,6 +149,8 @@ class Shelf(object):
 
     def init_icons(self):
         self.batch = pyglet.graphics.Batch()
+        # icons indexed by their position on screen, before scrolling
+        self.icon_grid = SpatialHash(ICON_HEIGHT)
         x = 853 - ICON_HALF - MARGIN
         y = 400 + ICON_HALF - MARGIN
         for icon in ICONS:
@@ -154,13 +160,16 @@ class Shelf(object):
             if icon.name not in PART_CLASSES:
                 particon.set_disabled(True)
             self.icons[icon.name] = particon 
+            self.icon_grid.insert(x, y, ICON_HALF, particon)
             y -= ICON_HEIGHT + ICON_SEP
 
         self.height = ICON_SEP - y
 
         # Mouse handling
         self.draggedicon = None
+        self.draggedname = None
         self.draggedpart = None
+        self.draggedstyle = None
 
     def update(self, dt):
         if not self.mousedown:
@@ -201,7 +210,7 @@ class Shelf(object):
 
     def icon_for_point(self, x, y):
         point = v(x, y) - v(0, self.scroll_y)
-        for i in self.icons.values():
+        for i in self.icon_grid.query(point.x, point.y):
             if i.contains(point) and not i.disabled:
                 return i.name
 
@@ -210,14 +219,12 @@ class Shelf(object):
         if self.parthud:
             s = v(x, y)
             if self.parthud.upgrade_button_rect and self.parthud.upgrade_button_rect.contains(s):
-                self.parthud.part.upgrade()
+                part = self.parthud.part
+                if part in self.monster.parts:
+                    self.edit('upgrade', {'path': self.monster.part_path(part)})
             else:
                 wpos = self.camera.screen_to_world(s)
-                for m in self.world.monsters:
-                    part = m.colliding_point(wpos)
-                    if part and part is self.parthud.part:
-                        break
-                else:
+                if self.world.part_at(wpos) is not self.parthud.part:
                     self.parthud = None
         self.mousedown = True
 
@@ -244,11 +251,8 @@ class Shelf(object):
             if self.parthud.locked:
                 return
         wpos = self.camera.screen_to_world(v(x, y))
-        for m in self.world.monsters:
-            part = m.colliding_point(wpos)
-            if part:
-                break
-        else:
+        part = self.world.part_at(wpos)
+        if part is None:
             if self.parthud and not self.parthud.locked:
                 self.parthud = None
             return
@@ -274,6 +278,8 @@ class Shelf(object):
         wpos = self.camera.screen_to_world(v(x, y))
         if self.draggedicon and x < (853 - ICON_HEIGHT - MARGIN):
             self.draggedpart = self.create_virtual_part(self.draggedicon, wpos)
+            self.draggedname = self.draggedicon
+            self.draggedstyle = STYLE_INVALID
             self.draggedicon = None
 
         if self.draggedpart:
@@ -282,20 +288,22 @@ class Shelf(object):
             if attachment is not None:
                 self.draggedpart.position_to_joint(attachment[1] - attachment[2])
                 self.draggedpart.set_position(attachment[1])
-                self.draggedpart.set_style(STYLE_VALID)
+                style = STYLE_VALID
             else:
-                self.draggedpart.set_style(STYLE_INVALID)
+                style = STYLE_INVALID
+            # restyling the sprite is not free, so only do it on change
+            if style != self.draggedstyle:
+                self.draggedpart.set_style(style)
+                self.draggedstyle = style
 
     def on_mouse_release(self, x, y, button, modifiers):
         if self.draggedpart:
             wpos = self.camera.screen_to_world(v(x, y))
-            self.draggedpart.set_position(wpos)
-            try:
-                self.monster.attach_and_grow(self.draggedpart)
-            except ValueError:
-                pass
-            else:
-                self.monster.spend_mutagen(self.draggedpart.cost)
+            self.edit('attach', {
+                'part': self.draggedname,
+                'position': tuple(wpos),
+                'cost': self.draggedpart.cost,
+            })
         elif self.parthud:
             self.parthud.locked = True
         self.draggedpart = None
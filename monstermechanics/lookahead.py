@@ -0,0 +1,182 @@
+"""An AI that looks ahead before deciding what to do.
+
+LookaheadController tries out each candidate action by restoring a snapshot
+of the world into a copy of it, a separate World, and running the copy
+forward HORIZON seconds: its own monster takes the action, while every other
+monster is driven by an ordinary AIController, so that the target fights
+back. The action whose rollout comes out best is picked.
+
+Running every rollout at once would stall the game, so a search is spread
+over successive decisions, each stepping the copy until BUDGET seconds of wall
+clock time are used, with the controller acting on its previous choice until
+the search finishes. Rollouts are not run in a worker process, as a world,
+with its physics and sprites, cannot be sent to one. As the budget depends
+on wall clock time, matches using the controller cannot be replayed.
+
+"""
+import time
+
+from .controller import AIController
+from .timers import Scheduler
+from .world import World
+
+# Candidate actions, as (direction to move relative to the target, fire)
+ACTIONS = {
+    'advance': (1, True),
+    'retreat': (-1, True),
+    'attack': (0, True),
+    'hold': (0, False),
+}
+ACTION_ORDER = ['attack', 'advance', 'retreat', 'hold']
+
+# Seconds to run each rollout for, and the length of each step
+HORIZON = 1.0
+STEP = 1.0 / 30
+
+# Wall clock seconds allowed for each decision
+BUDGET = 0.004
+
+# How much damage taken counts against damage dealt
+CAUTION = 1.2
+
+
+def head(monster):
+    """Return the part monster is rooted at.
+
+    This is not always the first part, as legs are put before the others.
+
+    """
+    for p in monster.parts:
+        if p._parent is None:
+            return p
+    return monster.parts[0]
+
+
+def health(monster):
+    """Return the total health of the parts of monster."""
+    if monster.dead:
+        return 0
+    return sum(p.health for p in monster.parts)
+
+
+class Rollout(object):
+    """An action tried out on a copy of the world."""
+    def __init__(self, world, snapshot, me, them, action):
+        world.restore(snapshot)
+        # The timers and listeners belong to the game, not to the fight
+        world.timers = Scheduler()
+        for m in world.monsters:
+            m.death_listeners = []
+            if m.controller is None or isinstance(m.controller, LookaheadController):
+                ai = AIController(world, m, m.name)
+                ai.pick_target()
+                m.set_controller(ai)
+        self.world = world
+        self.me = world.monsters[me]
+        self.them = world.monsters[them]
+        self.me.set_controller(None)
+        self.move, self.firing = ACTIONS[action]
+        self.time = 0
+        self.start = health(self.me), health(self.them)
+
+    def done(self):
+        return self.time >= HORIZON
+
+    def step(self):
+        me = self.me
+        if not me.dead and not self.them.dead:
+            if self.move:
+                x = head(me).get_position().x
+                ex = head(self.them).get_position().x
+                if (ex > x) == (self.move > 0):
+                    me.right()
+                else:
+                    me.left()
+            if self.firing:
+                me.attack()
+        self.world.update(STEP)
+        self.time += STEP
+
+    def score(self):
+        mine, theirs = self.start
+        dealt = theirs - health(self.them)
+        taken = mine - health(self.me)
+        return dealt - taken * CAUTION
+
+
+class Search(object):
+    """Rollouts of every action from one moment of a match."""
+    def __init__(self, world, monster, target, copy):
+        self.snapshot = world.snapshot()
+        monsters = self.snapshot.structure.monsters
+        self.me = monsters.index(monster)
+        self.them = monsters.index(target)
+        self.copy = copy
+        self.todo = list(ACTION_ORDER)
+        self.scores = {}
+        self.rollout = None
+
+    def run(self, budget):
+        """Run rollouts for up to budget seconds; return True once all are done."""
+        deadline = time.time() + budget
+        while self.todo:
+            if time.time() > deadline:
+                return False
+            if self.rollout is None:
+                self.rollout = Rollout(self.copy, self.snapshot, self.me, self.them, self.todo[0])
+            elif self.rollout.done():
+                self.scores[self.todo.pop(0)] = self.rollout.score()
+                self.rollout = None
+            else:
+                self.rollout.step()
+        return True
+
+    def best(self):
+        """Return the best action, or None if every action did as well.
+
+        Ties go to the earliest action in ACTION_ORDER.
+
+        """
+        scores = self.scores
+        if len(set(scores.values())) == 1:
+            return None
+        return max(ACTION_ORDER, key=lambda a: (scores[a], -ACTION_ORDER.index(a)))
+
+
+class LookaheadController(AIController):
+    """An AIController that picks actions by rolling a copy of the world forward."""
+    def __init__(self, world, monster, name='enemy', budget=BUDGET, **kwargs):
+        super(LookaheadController, self).__init__(world, monster, name, **kwargs)
+        self.budget = budget
+        self.action = None
+        self.search = None
+        # The world rollouts are run in, created on first use
+        self.copy = None
+
+    def decide(self):
+        if self.target is None or self.target.dead:
+            self.search = None
+            super(LookaheadController, self).decide()
+            return
+        if self.search is None:
+            if self.copy is None:
+                self.copy = World()
+            self.search = Search(self.world, self.monster, self.target, self.copy)
+        if self.search.run(self.budget):
+            self.action = self.search.best()
+            self.search = None
+
+        if self.action is None:
+            # No decision yet, or nothing to choose between the actions, so
+            # fall back to the strategies
+            super(LookaheadController, self).decide()
+            return
+        self.monster_x = head(self.monster).get_position().x
+        self.enemy_x = head(self.target).get_position().x
+        move, self.attacking = ACTIONS[self.action]
+        if move > 0:
+            self.move = self.towards()
+        elif move < 0:
+            self.move = self.away()
+        else:
+            self.move = 0
@@ -4,13 +4,17 @@ import math
 import pyglet
 import json
 
-import random
+import heapq
+import itertools
+from collections import deque
 
 from actor import Actor
 from geom import *
-from vector import v
+from vector import v, VectorArray
 
 from projectiles import Thistle, Blood
+from .hierarchy import PartTree
+from .spatial import SpatialHash
 from .controller import AIController
 
 STYLE_NORMAL = 0
@@ -39,8 +43,12 @@ class BodyPart(Actor):
     ATTACH_CENTER = False
     DEFAULT_PART = 'default'
     type = 'body'
+    # Parts that can attack are registered with their monster's weapons
+    WEAPON = False
     attack_ready = False
+    attack_timer = 0
     cost = 200
+    monster = None
 
     def __repr__(self):
         return '<%s %d>' % (self.__class__.__name__, id(self))
@@ -54,33 +62,34 @@ class BodyPart(Actor):
     def get_max_health(self):
         return self.MAX_HEALTH
 
-    def add_health(self, h, seen=[]):
-        seen = seen[:]
+    def add_health(self, h):
+        """Add health up to the maximum, and return the amount that did not fit.
+
+        To heal a part that is attached to a monster, use
+        Monster.queue_healing(), which spreads the excess to other parts.
+
+        """
         self.health += h
         maxh = self.get_max_health()
         if self.health > maxh:
-            extra = maxh - self.health
+            extra = self.health - maxh
             self.health = maxh
-            conn = self.get_connected()
-            for c in conn:
-                if c in seen:
-                    continue
-                c.add_health(extra / len(conn), seen + [self])
+            return extra
+        return 0
 
     def get_lung_multiplier(self):
-        lungs = len([p for p in self.get_connected() if isinstance(p, Lung)])
-        return 1.3 ** lungs
+        return 1.3 ** self.monster.graph.get_lung_count(self)
     
+    # Attributes captured by World.snapshot(), besides the physics state
+    SNAPSHOT_ATTRS = ('health', 'scale', 'phase', 'attack_timer', 'attack_ready', 'hit_time', 'cost')
+
     def subparts(self):
         """In nested bodies, return sub-bodies."""
         return [self]
 
     def get_connected(self):
-        connected = []
-        if self._parent:
-            connected.append(self._parent)
-        connected.extend([p for p, j in self._joints])
-        return connected
+        """Return the parts attached to this one. Do not modify the list."""
+        return self.monster.graph.get_neighbours(self)
 
     def position_to_joint(self, joint):
         """Default implementation does nothing."""
@@ -123,38 +132,95 @@ class BodyPart(Actor):
         inst = cls(v(*js['position']), name=name)
         return inst
 
+    def set_position(self, pos):
+        super(BodyPart, self).set_position(pos)
+        self.moved()
+
+    def set_scale(self, scale):
+        super(BodyPart, self).set_scale(scale)
+        self.moved()
+
+    def set_part(self, name):
+        super(BodyPart, self).set_part(name)
+        self.moved()
+
+    def moved(self):
+        """Note that the part was moved or reshaped other than by the physics engine."""
+        if self.monster is not None:
+            self.monster.part_moved(self)
+
+    _bounds_key = None
+
+    def bounds_key(self):
+        """Return the position, angle and shape the bounds of the part depend on."""
+        if self.body:
+            x, y = self.body.get_position()
+            angle = self.body.get_rotation()
+        else:
+            x, y = self.sprite.position
+            # sprite rotation is clockwise in degrees
+            angle = -math.radians(self.sprite.rotation)
+        return x, y, angle, self.scale, id(self.part)
+
+    def update_bounds(self):
+        """Recompute the bounds of the part if it has moved.
+
+        Return True if the bounds changed.
+
+        """
+        key = self.bounds_key()
+        if key == self._bounds_key:
+            return False
+        x, y, angle = key[:3]
+        shapes = self.get_shapes()
+        centres = VectorArray([c.center for c in shapes]).rotated(math.degrees(angle)) + v(x, y)
+        self._bounds = Rect.from_bounds(*centres.bounds([c.radius for c in shapes]))
+        self._bounds_key = key
+        return True
+
     def get_bounds(self):
-        ang = self.sprite.rotation * math.pi / 180
-        bounds = None
-        basepos = v(*self.sprite.position)
-        for s in self.get_shapes():
-            center = v(*s.center)
-            center = center.rotated(ang) + basepos
-            diag = v(-s.radius, s.radius)
-            sbounds = Rect(center + diag, center - diag)
-            if bounds is None:
-                bounds = sbounds
-            else:
-                bounds = bounds.union(sbounds)
-        return bounds
+        self.update_bounds()
+        return self._bounds
 
     _parent = None
 
+    def subtree(self):
+        """Return this part and every part attached to it, parents first."""
+        parts = []
+        stack = [self]
+        while stack:
+            p = stack.pop()
+            parts.append(p)
+            stack.extend(c for c, j in reversed(p._joints))
+        return parts
+
+    def make_blood(self):
+        pos = self.get_position()
+        rnd = self.world.random
+        blood = []
+        for p, radius in self.get_shapes():
+            for i in range(int(radius * radius / 100.0)):
+                off = v(rnd.gauss(0, radius * 0.5), rnd.gauss(0, radius * 0.5))
+                blood.append(Blood(pos + p + off, name=''))
+        return blood
+
     def kill(self):
-        for p, j in self._joints:
-            p.kill()
+        """Kill this part and everything attached to it."""
+        doomed = self.subtree()
         if self._parent is not None:
             self._parent._joints = [(p, j) for p, j in self._parent._joints if p is not self]
 
-        for p, radius in self.get_shapes():
-            for i in range(int(radius * radius / 100.0)):
-                off = v(random.gauss(0, radius * 0.5), random.gauss(0, radius * 0.5))
-                self.world.spawn(Blood(self.get_position() + p + off, name=''))
+        world = self.world
+        monster = self.monster
+        blood = []
+        for p in reversed(doomed):
+            blood.extend(p.make_blood())
 
-        self.world.destroy(self)
-        self.monster.remove_part(self)
+        world.destroy_many(doomed)
+        monster.remove_parts(doomed)
+        world.spawn_many(blood)
         if self._parent is None:
-            self.monster.kill()
+            monster.kill()
 
 
 
@@ -180,6 +246,9 @@ class UpgradeablePart(BodyPart):
 
     level = 1
 
+    # The level comes first, as changing it replaces the part's shapes
+    SNAPSHOT_ATTRS = ('level',) + BodyPart.SNAPSHOT_ATTRS
+
     def upgrade_cost(self):
         return self.cost * 2 ** self.level
 
@@ -233,6 +302,7 @@ class OutFacingPart(BodyPart):
         self.sprite.rotation = 180 - a
         if self.body:
             self.body.set_rotation(-self.sprite.rotation * math.pi / 180.0)
+        self.moved()
 
 
 class PulsingBodyPart(BodyPart):
@@ -241,10 +311,18 @@ class PulsingBodyPart(BodyPart):
     pulse_rate = 1
     pulse_amount = 0.1
 
+    # Rescaling rebuilds the body's shapes and wakes it, so smaller changes
+    # are skipped
+    RESCALE_THRESHOLD = 0.001
+
     def update(self, dt):
         self.phase += dt * self.pulse_rate
+        if self.body.is_sleeping():
+            return
         s = self.pulse_amount * math.cos(self.phase) + 1 - self.pulse_amount
-        self.set_scale(self.scale * 0.97 + s * 0.03)
+        scale = self.scale * 0.97 + s * 0.03
+        if abs(scale - self.scale) >= self.RESCALE_THRESHOLD:
+            self.set_scale(scale)
 
 
 class Wing(UpgradeablePart):
@@ -306,8 +384,9 @@ class Heart(UpgradeablePart, PulsingBodyPart):
     def update(self, dt):
         super(Heart, self).update(dt)
         lung_boost = self.get_lung_multiplier()
+        amount = lung_boost * self.HEAL_RATE[self.level - 1] * dt
         for c in self.get_connected():
-            c.add_health(lung_boost * self.HEAL_RATE[self.level - 1] * dt, seen=[self])
+            self.monster.queue_healing(c, amount)
 
 
 class MutagenBladder(UpgradeablePart, PulsingBodyPart):
@@ -335,17 +414,28 @@ class ThistleGun(UpgradeablePart):
         'right': v(1, 0.2) * 0.0001,
     }
 
+    WEAPON = True
     attack_ready = True
     attack_timer = 0
     
     PROJECTILE = Thistle
     MAX_HEALTH = 100, 200, 300
 
+    # Direction each team's guns fire in when there is no enemy to aim at;
+    # teams other than the player's use the enemy art, which faces the other
+    # way
+    FACING = {
+        'player': 'left',
+    }
+
     def get_dir(self):
-        return {
-            'player': 'left',
-            'enemy': 'right'
-        }[self.name]
+        """Return the direction to fire in, towards the nearest enemy."""
+        enemies = self.world.get_enemies_for_name(self.name)
+        if not enemies:
+            return self.FACING.get(self.name, 'right')
+        x = self.get_position().x
+        nearest = min(enemies, key=lambda m: abs(m.get_position().x - x))
+        return 'right' if nearest.get_position().x > x else 'left'
 
     def update(self, dt):
         super(ThistleGun, self).update(dt)
@@ -388,10 +478,15 @@ class Leg(UpgradeablePart):
 
     MAX_HEALTH = 300, 450, 600
 
+    # A sleeping leg is left to lie unless it is tilted by more than this
+    SLEEP_ANGLE = 0.05
+
     def update(self, dt):
         super(Leg, self).update(dt)
         #FIXME: only apply torque if the leg is touching the ground
         rot = self.body.get_rotation()
+        if abs(rot) < self.SLEEP_ANGLE and self.body.is_sleeping():
+            return
         gain = -0.0003
         self.body.apply_torque(rot * gain)
 
@@ -407,6 +502,7 @@ class UpperArm(BodyPart):
 
 class Arm(BodyPart):
     ATTACH_CENTER = True
+    BATCH_BODY = False
 
     MAX_HEALTH = 200, 300, 500
 
@@ -433,6 +529,7 @@ class Arm(BodyPart):
     def set_scale(self, scale):
         self.upper.set_scale(scale)
         self.lower.set_scale(scale)
+        self.moved()
 
     def set_style(self, style):
         self.upper.set_style(style)
@@ -455,10 +552,18 @@ class Arm(BodyPart):
         else:
             self.upper.set_position(pos)
             self.lower.set_position(self.upper.get_position() + self.upper.get_shapes()[1].center)
+        self.moved()
 
     def get_position(self):
         return self.upper.get_position()
 
+    def update_bounds(self):
+        changed = self.upper.update_bounds()
+        changed = self.lower.update_bounds() or changed
+        if changed:
+            self._bounds = self.upper._bounds.union(self.lower._bounds)
+        return changed
+
     def draw(self):
         self.upper.draw()
         self.lower.draw()
@@ -480,6 +585,122 @@ PART_CLASSES = {
     'thistlegun': ThistleGun,
 }
 
+class PartGraph(object):
+    """Which parts of a monster are attached to which.
+
+    This is kept up to date as parts are attached and removed, along with the
+    number of lungs attached to each part, so that reading either does not
+    have to build anything.
+
+    """
+    def __init__(self, parts=()):
+        self.neighbours = {}
+        self.lungs = {}
+        for p in parts:
+            self.add(p)
+        for p in parts:
+            for c, j in p._joints:
+                self.connect(p, c)
+
+    def add(self, part):
+        if part not in self.neighbours:
+            self.neighbours[part] = []
+            self.lungs[part] = 0
+
+    def connect(self, a, b):
+        """Record that a and b have been attached."""
+        self.add(a)
+        self.add(b)
+        self.neighbours[a].append(b)
+        self.neighbours[b].append(a)
+        if isinstance(b, Lung):
+            self.lungs[a] += 1
+        if isinstance(a, Lung):
+            self.lungs[b] += 1
+
+    def remove(self, part):
+        """Remove part, detaching it from all its neighbours."""
+        is_lung = isinstance(part, Lung)
+        for n in self.neighbours.pop(part, ()):
+            self.neighbours[n].remove(part)
+            if is_lung:
+                self.lungs[n] -= 1
+        self.lungs.pop(part, None)
+
+    def get_neighbours(self, part):
+        return self.neighbours.get(part, ())
+
+    def get_lung_count(self, part):
+        return self.lungs.get(part, 0)
+
+
+class AttachmentSurfaces(object):
+    """The circles of a monster that each type of part can attach to.
+
+    Which parts accept a type of part only changes when parts are added or
+    removed. The circles of those parts are indexed by position at most once
+    per world tick, so finding where a dragged part would attach costs the
+    same however big the monster is.
+
+    """
+    CELL_SIZE = 64
+
+    def __init__(self, monster):
+        self.monster = monster
+        self.by_type = {}
+
+    def invalidate(self):
+        """Forget the surfaces, eg. because parts were added or removed."""
+        self.by_type = {}
+
+    def index_for(self, part):
+        """Return a SpatialHash of (subpart, centre, radius) part could attach to."""
+        key = type(part)
+        try:
+            entry = self.by_type[key]
+        except KeyError:
+            accepting = []
+            for currentpart in self.monster.parts:
+                accepting.extend(p for p in currentpart.subparts() if p.can_attach(part))
+            entry = self.by_type[key] = [accepting, None, SpatialHash(self.CELL_SIZE)]
+
+        accepting, tick, grid = entry
+        if tick != self.monster.world.tick:
+            grid.clear()
+            for p in accepting:
+                ppos = p.get_position()
+                for centre, radius in p.get_shapes():
+                    c = centre + ppos
+                    grid.insert(c.x, c.y, radius, (p, c, radius))
+            entry[1] = self.monster.world.tick
+        return grid
+
+    def nearest(self, part):
+        """Find the attachment point for part on the nearest surface it touches."""
+        grid = self.index_for(part)
+        partpos = part.get_position()
+        baseshape = part.get_base_shape()
+        partpos += baseshape.center
+        partradius = baseshape.radius
+
+        best = None
+        best_gap = None
+        for p, c, radius in grid.query(partpos.x, partpos.y, partradius):
+            vec = (partpos - c)
+            if vec.length2 < (radius + partradius) * (radius + partradius):
+                gap = vec.length - radius
+                if best is None or gap < best_gap:
+                    best = p, c, vec, radius
+                    best_gap = gap
+        if best is None:
+            return None
+        p, c, vec, radius = best
+        if part.ATTACH_CENTER:
+            return p, c, c
+        else:
+            return p, c + vec.scaled_to(radius + partradius), c + vec.scaled_to(radius)
+
+
 class Monster(object):
     @staticmethod
     def load_all():
@@ -506,6 +727,26 @@ class Monster(object):
         self.death_listeners = []
         self.controller = None
         self.dead = False
+        self._bounds_acc = Bounds()
+        self._bounds_dirty = True
+        # Parts whose bounds may have changed since get_bounds() last looked,
+        # and the physics step it last looked at
+        self._moved = set(self.parts)
+        self._bounds_steps = None
+        self.tree = PartTree(self)
+        self.surfaces = AttachmentSurfaces(self)
+        self.graph = PartGraph(self.parts)
+        self.healing = {}
+        self.healing_order = []
+
+        # Parts that can attack, and a heap of (time, seq, part) giving the
+        # world time at which each will next be ready
+        self.weapons = []
+        self.ready_weapons = []
+        self.weapon_seq = itertools.count()
+        for p in self.parts:
+            if p.WEAPON:
+                self.add_weapon(p)
 
     def set_controller(self, controller):
         self.controller = controller
@@ -526,14 +767,37 @@ class Monster(object):
     def spend_mutagen(self, value):
         self.mutagen = max(0, self.mutagen - value)
 
+    def part_moved(self, part):
+        self._moved.add(part)
+
     def get_bounds(self):
-        bounds = None
-        for p in self.parts:
-            if bounds is None:
-                bounds = p.get_bounds()
-            else:
-                bounds = bounds.union(p.get_bounds())
-        return bounds
+        """Return the bounds of all parts.
+
+        Parts cache their own bounds, keyed on the position and angle of
+        their bodies. Only the parts that may have moved since the last call
+        are looked at: those moved by the game, and those that were awake when
+        the physics was stepped. The union is only recomputed if one of them
+        did move, or parts were added or removed.
+
+        """
+        moved = self._moved
+        steps = self.world.world.steps
+        if steps != self._bounds_steps:
+            self._bounds_steps = steps
+            moved.update(p for p in self.parts if not p.body.is_sleeping())
+        changed = self._bounds_dirty
+        for p in moved:
+            if p.update_bounds():
+                changed = True
+        moved.clear()
+        if changed:
+            acc = self._bounds_acc
+            acc.clear()
+            for p in self.parts:
+                acc.add_rect(p._bounds)
+            self._bounds = acc.rect()
+            self._bounds_dirty = False
+        return self._bounds
 
     def get_mutagen_capacity(self):
         s = 1000
@@ -545,58 +809,143 @@ class Monster(object):
             s += m
         return s
 
+    def queue_healing(self, part, amount):
+        """Heal part by amount when the healing is resolved at the end of the tick."""
+        try:
+            self.healing[part] += amount
+        except KeyError:
+            self.healing[part] = amount
+            self.healing_order.append(part)
+
+    def resolve_healing(self):
+        """Apply the healing queued this tick.
+
+        Healing that takes a part over its maximum health overflows to the
+        parts attached to it, split evenly between them, and so on through the
+        monster. Each part is healed at most once per tick, in breadth first
+        order from the parts the hearts healed, so the sweep takes time
+        proportional to the size of the monster.
+
+        """
+        if not self.healing_order:
+            return
+        incoming = self.healing
+        queue = deque(self.healing_order)
+        self.healing = {}
+        self.healing_order = []
+
+        neighbours = self.graph.neighbours
+        done = set()
+        while queue:
+            part = queue.popleft()
+            amount = incoming.pop(part)
+            if part not in neighbours:
+                # killed since the healing was queued
+                continue
+            done.add(part)
+            extra = part.add_health(amount)
+            if extra <= 0:
+                continue
+            conn = neighbours[part]
+            share = extra / len(conn)
+            for c in conn:
+                if c in done:
+                    continue
+                if c in incoming:
+                    incoming[c] += share
+                else:
+                    incoming[c] = share
+                    queue.append(c)
+
     def left(self):
         self.moving = LEFT
 
     def right(self):
         self.moving = RIGHT
 
+    def add_weapon(self, part):
+        self.weapons.append(part)
+        ready = self.world.time + part.attack_timer
+        heapq.heappush(self.ready_weapons, (ready, next(self.weapon_seq), part))
+
     def attack(self):
-        for p in self.parts:
+        """Attack with every weapon that is ready."""
+        now = self.world.time
+        queue = self.ready_weapons
+        requeue = []
+        while queue and queue[0][0] <= now:
+            t, seq, p = heapq.heappop(queue)
+            if p not in self.weapons:
+                continue
             if p.attack_ready:
                 p.attack()
+            requeue.append((now + p.attack_timer, seq, p))
+        for entry in requeue:
+            heapq.heappush(queue, entry)
 
     def add_part(self, part):
         part.monster = self
+        self.graph.add(part)
+        if part.WEAPON:
+            self.add_weapon(part)
         if isinstance(part, Leg):
             self.leg_count += 1
             self.parts.insert(0, part)
         else:
             self.parts.append(part)
+        self.invalidate_geometry()
+        self.world.structure_version += 1
 
     def remove_part(self, part):
-        self.parts.remove(part)
-        if isinstance(part, Leg):
-            self.leg_count -= 1
+        self.remove_parts([part])
+
+    def invalidate_geometry(self):
+        """Forget cached bounds and indexes, eg. after the monster has moved."""
+        self._bounds_dirty = True
+        self._moved = set(self.parts)
+        self.tree.invalidate()
+        self.surfaces.invalidate()
+
+    def remove_parts(self, parts):
+        """Remove several parts at once, rebuilding the part lists only once."""
+        doomed = set(parts)
+        self.parts = [p for p in self.parts if p not in doomed]
+        # entries in ready_weapons are dropped when they next come up
+        self.weapons = [w for w in self.weapons if w not in doomed]
+        for p in parts:
+            self.graph.remove(p)
+            if isinstance(p, Leg):
+                self.leg_count -= 1
+        self.invalidate_geometry()
+        self.world.structure_version += 1
 
     def colliding(self, actor, allowance=0):
         """Find an actor is colliding with this monster."""
-        partpos = actor.get_position()
+        x, y = actor.get_position()
         baseshape = actor.get_base_shape()
-        partpos += baseshape.center
-        partradius = baseshape.radius
-        for currentpart in self.parts:
-            for p in currentpart.subparts():
-                ppos = p.get_position()
-                for centre, radius in p.get_shapes():
-                    # FIXME: rotation
-                    c = centre + ppos
-                    vec = (partpos - c)
-                    if vec.length2 < (radius + partradius + allowance) * (radius + partradius + allowance):
-                        return currentpart
+        cx, cy = baseshape.center
+        x += cx
+        y += cy
+        reach = baseshape.radius + allowance
+        for node in self.tree.candidates(x, y, reach):
+            # FIXME: rotation
+            for px, py, radius, p in node.circles:
+                dx = x - px
+                dy = y - py
+                if dx * dx + dy * dy < (radius + reach) * (radius + reach):
+                    return node.part
         return None
 
     def colliding_point(self, point):
         """Find an actor is colliding with this monster."""
-        for currentpart in self.parts:
-            for p in currentpart.subparts():
-                ppos = p.get_position()
-                for centre, radius in p.get_shapes():
-                    # FIXME: take into account rotation
-                    c = centre + ppos
-                    vec = (point - c)
-                    if vec.length < radius:
-                        return currentpart
+        x, y = point
+        for node in self.tree.candidates(x, y, 0):
+            # FIXME: take into account rotation
+            for px, py, radius, p in node.circles:
+                dx = x - px
+                dy = y - py
+                if dx * dx + dy * dy < radius * radius:
+                    return node.part
         return None
 
     def attachment_point(self, part):
@@ -605,23 +954,7 @@ class Monster(object):
         Returns None if no suitable attachment point exists.
 
         """
-        partpos = part.get_position()
-        baseshape = part.get_base_shape()
-        partpos += baseshape.center
-        partradius = baseshape.radius
-        for currentpart in self.parts:
-            for p in currentpart.subparts():
-                if not p.can_attach(part):
-                    continue
-                ppos = p.get_position()
-                for centre, radius in p.get_shapes():
-                    c = centre + ppos
-                    vec = (partpos - c)
-                    if vec.length2 < (radius + partradius) * (radius + partradius):
-                        if part.ATTACH_CENTER:
-                            return p, c, c
-                        else:
-                            return p, c + vec.scaled_to(radius + partradius), c + vec.scaled_to(radius)
+        return self.surfaces.nearest(part)
 
     def can_attach(self, part):
        return self.attachment_point(part) is not None 
@@ -682,6 +1015,32 @@ class Monster(object):
         j = target.body.attach(part.body, jointpos)
         target._joints.append((part, j))
         part._parent = target
+        self.graph.connect(target, part)
+        self.world.structure_version += 1
+
+    def part_path(self, part):
+        """Return the path from the head to part, as a list of joint indices.
+
+        Unlike its index in self.parts, a part's path is not changed by
+        attaching other parts, so it can identify the part in recorded edits.
+
+        """
+        path = []
+        while part._parent is not None:
+            parent = part._parent
+            path.append([c for c, j in parent._joints].index(part))
+            part = parent
+        path.reverse()
+        return path
+
+    def part_at_path(self, path):
+        """Return the part at the end of path, or None if there is none."""
+        part = next((p for p in self.parts if p._parent is None), None)
+        for i in path:
+            if part is None or i >= len(part._joints):
+                return None
+            part = part._joints[i][0]
+        return part
 
     def to_json(self):
         parts = []
@@ -723,13 +1082,15 @@ class Monster(object):
             part = cls.from_json(p, name)
             parts.append(part)
             part_map[p['id']] = part
-            world.spawn(part)
+        world.spawn_many(parts)
 
         # re-attach parts with joints
-        for j in json['joints']:
-            body1 = part_map[j['body1']]
-            body2 = part_map[j['body2']]
-            body1._joints.append((body2, body1.body.restore_joint(body2.body, j)))
+        pairs = [(part_map[j['body1']], part_map[j['body2']]) for j in json['joints']]
+        joints = world.world.restore_joints([
+            (body1.body, body2.body, j) for (body1, body2), j in zip(pairs, json['joints'])
+        ])
+        for (body1, body2), joint in zip(pairs, joints):
+            body1._joints.append((body2, joint))
             body2._parent = body1
         return Monster(world, parts, name=name)
 
@@ -740,31 +1101,36 @@ class Monster(object):
         return Monster.from_json(world, mutant, 'player')
 
     @staticmethod
-    def enemy_from_json(world, fname):
+    def enemy_from_json(world, fname, controller=AIController):
         with open(fname, 'r') as f:
             mutant = json.load(f)
+        return Monster.enemy_from_design(world, mutant, controller)
+
+    @staticmethod
+    def enemy_from_design(world, mutant, controller=AIController):
+        """Create an enemy from a design loaded from JSON, facing the player."""
         player = world.get_player()
         x = player.get_bounds().tl.x
         mxpos = mutant['parts'][0]['position'][0]
         trans = x - mxpos + 400
-        def refl(pos):
-            x, y = pos
-            return v(-x, y)
-        def refl_and_move(pos):
-            x, y = pos
-            return v(trans - x, y)
         def rot(angle):
             return math.pi - angle
 
-        for p in mutant['parts']:
-            p['position'] = refl_and_move(p['position'])
+        parts = mutant['parts']
+        joints = mutant['joints']
+        positions = VectorArray([p['position'] for p in parts]).reflected_x() + v(trans, 0)
+        anchors1 = VectorArray([j['anchor1'] for j in joints]).reflected_x()
+        anchors2 = VectorArray([j['anchor2'] for j in joints]).reflected_x()
+
+        for p, pos in zip(parts, positions):
+            p['position'] = pos
             p['angle'] = rot(p['angle']) 
-        for j in mutant['joints']:
-            j['anchor1'] = refl(j['anchor1'])
-            j['anchor2'] = refl(j['anchor2'])
+        for j, a1, a2 in zip(joints, anchors1, anchors2):
+            j['anchor1'] = a1
+            j['anchor2'] = a2
             j['angle'] = rot(j['angle']) 
             j['refAngle'] = -j['refAngle']
 
         m = Monster.from_json(world, mutant, 'enemy')
-        m.set_controller(AIController(world, m, 'enemy'))
+        m.set_controller(controller(world, m, 'enemy'))
         return m
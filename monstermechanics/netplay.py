@@ -0,0 +1,227 @@
+"""Two player matches, with each player in their own process.
+
+Both processes run the whole match. Each player loads the design of their own
+monster, and before the match starts the two processes swap designs. After
+that each process keeps its copy of the match in step with the other's using
+a session.Session, which sends only the inputs of the local player.
+
+"""
+from __future__ import division, print_function
+
+import json
+import socket
+import struct
+import sys
+import time
+
+import pyglet
+
+from .game import Game, target_fps
+from .camera import FOCUS_RADIUS
+from .monster import Monster
+from .world import World
+from .replay import tick_seed, pack_controls
+from .session import Session, DT, TEAMS
+
+# Design each side plays when none is given
+DESIGNS = ('data/enemies/enemy1.json', 'data/enemies/enemy2.json')
+
+# Side 1 listens on PORT and side 2 on PORT + 1
+PORT = 24650
+
+# Real time that may build up while waiting, so that the match does not race
+# to catch up afterwards
+MAX_LAG = 0.25
+
+# Packets holding designs start with this, rather than session.INPUTS
+DESIGN = b'D'
+
+# Whether the sender has the receiver's design, followed by the sender's
+# design as JSON
+DESIGN_HEADER = struct.Struct('<c?')
+
+# Largest packet that can arrive, as designs can be long
+MAX_PACKET = 65535
+
+# Seconds between sending designs while waiting for the other player
+DESIGN_RESEND = 0.1
+
+
+class UDPTransport(object):
+    """Exchanges datagrams with a single peer, without blocking."""
+    def __init__(self, port, peer, host=''):
+        self.peer = socket.gethostbyname(peer[0]), peer[1]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+
+    def send(self, data):
+        try:
+            self.sock.sendto(data, self.peer)
+        except socket.error:
+            # the peer is not listening yet; the inputs are sent again
+            pass
+
+    def receive(self):
+        """Return the packets that have arrived from the peer."""
+        packets = []
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(MAX_PACKET)
+            except socket.error:
+                return packets
+            if addr == self.peer:
+                packets.append(data)
+
+    def close(self):
+        self.sock.close()
+
+
+class DesignExchange(object):
+    """Swaps monster designs with the peer, wrapping the transport for the match.
+
+    Once the designs have been swapped, the peer may still be waiting to hear
+    that its design arrived, so design packets are answered throughout the
+    match; every other packet is passed through.
+
+    """
+    def __init__(self, transport, design):
+        self.transport = transport
+        self.design = design
+        self.remote_design = None
+        # The peer has our design
+        self.delivered = False
+        self.finished = False
+
+    def exchange(self):
+        """Send our design until the peer has it, and return the peer's."""
+        while self.remote_design is None or not self.delivered:
+            self.send_design()
+            self.receive()
+            time.sleep(DESIGN_RESEND)
+        self.finished = True
+        return self.remote_design
+
+    def send_design(self):
+        header = DESIGN_HEADER.pack(DESIGN, self.remote_design is not None)
+        self.transport.send(header + self.design.encode('utf8'))
+
+    def send(self, data):
+        self.transport.send(data)
+
+    def receive(self):
+        packets = []
+        for data in self.transport.receive():
+            if data[:1] != DESIGN:
+                packets.append(data)
+                continue
+            try:
+                delivered = DESIGN_HEADER.unpack_from(data)[1]
+            except struct.error:
+                continue
+            if delivered:
+                self.delivered = True
+            if self.remote_design is None:
+                self.remote_design = data[DESIGN_HEADER.size:].decode('utf8')
+            if self.finished:
+                self.send_design()
+        return packets
+
+    def close(self):
+        self.transport.close()
+
+
+class VersusGame(Game):
+    """A match between two people, each playing one monster in their own process."""
+    def __init__(self, side, transport, seed=0, **kwargs):
+        super(VersusGame, self).__init__(**kwargs)
+        self.side = side
+        # A DesignExchange, holding the local player's design
+        self.transport = transport
+        self.seed = seed
+        # Designs of the player and enemy teams' monsters, as JSON
+        self.designs = None
+        self.session = None
+        # Real time not yet simulated
+        self.lag = 0
+        self.finished = False
+
+    def start(self):
+        print('Waiting for the other player...')
+        remote = self.transport.exchange()
+        if self.side == 0:
+            self.designs = self.transport.design, remote
+        else:
+            self.designs = remote, self.transport.design
+        self.open_window()
+        self.create_world()
+        pyglet.clock.schedule_interval(self.update, 1/target_fps)
+        self.window.set_handlers(
+            on_draw=self.on_draw,
+            on_key_press=self.on_key_press,
+            on_key_release=self.on_key_release,
+        )
+        pyglet.app.run()
+        self.transport.close()
+        s = self.session
+        print('%d ticks, %d rollbacks' % (s.tick, s.rollbacks))
+        if s.desyncs:
+            print('desynced from the other player at tick %d' % s.desyncs[0], file=sys.stderr)
+
+    def create_world(self):
+        self.world = World(tick_seed(self.seed, 0), step=DT)
+        player = Monster.from_json(self.world, json.loads(self.designs[0]), 'player')
+        self.world.add_monster(player)
+        enemy = Monster.enemy_from_design(self.world, json.loads(self.designs[1]))
+        enemy.set_controller(None)
+        self.world.add_monster(enemy)
+        self.monster = (player, enemy)[self.side]
+        self.session = Session(self.world, self.seed, self.side, self.transport)
+        self.show_message('fight', 2)
+
+    def update(self, dt):
+        self.update_timers(dt)
+        self.lag = min(self.lag + dt, MAX_LAG)
+        bits = pack_controls(self.control_state)
+        while self.lag >= DT and self.session.advance(bits):
+            self.lag -= DT
+
+        # A rollback may have replaced the monsters
+        team = self.world.teams.get(TEAMS[self.side])
+        self.monster = team[0] if team else None
+        self.check_outcome()
+
+        self.camera.set_origin(self.world.origin)
+        self.camera.track_bounds(self.world.get_monster_bounds(self.monster, FOCUS_RADIUS))
+        self.camera.update(dt)
+
+    def check_outcome(self):
+        survivors = self.session.get_survivors()
+        if self.finished or survivors is None or len(survivors) > 1:
+            return
+        self.finished = True
+        if TEAMS[self.side] in survivors:
+            self.show_message('congratulations')
+        else:
+            self.show_message('game-over')
+
+    def on_draw(self):
+        self.camera.set_matrix()
+        self.background.draw(self.camera.get_viewport(), self.world.origin)
+        self.world.draw()
+        if self.show_fps:
+            self.fps_display.draw()
+        if self.message:
+            self.message.draw()
+
+
+def play_versus(side, peer='127.0.0.1', port=PORT, seed=0, design=None):
+    """Play a match as side 0 or 1 against the other side at peer.
+
+    design is the path of the local player's monster design.
+
+    """
+    with open(design or DESIGNS[side], 'r') as f:
+        design = f.read()
+    transport = UDPTransport(port + side, (peer, port + 1 - side))
+    VersusGame(side, DesignExchange(transport, design), seed).start()
@@ -9,19 +9,47 @@ replace the physics library easily or even write our own.
 """
 from vector import Vector
 
+# The teams that monsters can be on. Each team has a collision class for each
+# of TEAM_TYPES, so with 16 collision bits there can be at most five teams.
+TEAMS = ['player', 'enemy', 'red', 'green', 'blue']
+
+# Types of actor on a team, and the types they collide with on their own team
+# and on other teams
+TEAM_TYPES = [
+    ('arm', ['arm'], ['arm', 'body', 'projectile']),
+    ('body', ['body'], ['arm', 'body', 'projectile']),
+    ('projectile', [], ['arm', 'body', 'projectile']),
+]
+
+
+def team_collision_classes(teams):
+    """Return the collision classes for the given teams.
+
+    Each class is named after a team and a type, eg. 'playerarm', plus there
+    is a 'neutral' class for scenery such as blood.
+
+    """
+    classes = []
+    for team in teams:
+        for type, own, other in TEAM_TYPES:
+            collides = [team + t for t in own]
+            for enemy in teams:
+                if enemy != team:
+                    collides.extend(enemy + t for t in other)
+            classes.append((team + type, collides))
+    classes.append(('neutral', [team + 'body' for team in teams]))
+    return classes
+
+
 # Collision classes and the other classes they collide with
 # These should be baked into bitmasks or whatever by the physics engine
-COLLISION_CLASSES = [
-    ('playerarm', ['playerarm', 'enemyarm', 'enemybody', 'enemyprojectile']),
-    ('playerbody', ['playerbody', 'enemyarm', 'enemybody', 'enemyprojectile']),
-    ('playerprojectile', ['enemybody', 'enemyarm', 'enemyprojectile']),
-    ('enemyarm', ['enemyarm', 'playerarm', 'playerbody', 'playerprojectile']),
-    ('enemybody', ['enemybody', 'playerarm', 'playerbody', 'playerprojectile']),
-    ('enemyprojectile', ['playerbody', 'playerarm', 'playerprojectile']),
-    ('neutral', ['playerbody', 'enemybody']),
-]
+COLLISION_CLASSES = team_collision_classes(TEAMS)
 
 class AbstractWorld(object):
+    # Number of times the physics has been stepped, so that callers can tell
+    # whether bodies may have moved
+    steps = 0
+
     def update(self, dt):
         """Update then physics of world."""
         raise NotImplementedError("AbstractWorld.update()")
@@ -36,6 +64,47 @@ class AbstractWorld(object):
         """
         raise NotImplementedError("AbstractPhysics.create_body()")
 
+    def create_bodies(self, defs):
+        """Create several bodies at once.
+
+        defs should be a list of tuples (circles, collision_class). Returns a
+        list of bodies. Subclasses may be able to do this more efficiently than
+        calling create_body() for each.
+
+        """
+        return [self.create_body(circles, collision_class=cc) for circles, cc in defs]
+
+    def restore_joints(self, joints):
+        """Recreate several joints serialised with Joint.to_json().
+
+        joints should be a list of tuples (body1, body2, json). Returns a list
+        of joints.
+
+        """
+        return [b1.restore_joint(b2, js) for b1, b2, js in joints]
+
+    def get_sleeping_fraction(self):
+        """Return the fraction of bodies that are asleep."""
+        return 0.0
+
+    def shift_origin(self, offset):
+        """Move every body in the world by offset, except the ground."""
+        raise NotImplementedError("AbstractWorld.shift_origin()")
+
+    def destroy_bodies(self, bodies):
+        """Destroy several bodies, and every joint attached to them, at once."""
+        for b in bodies:
+            b.destroy()
+
+    def reset(self, bodies, joints):
+        """Discard any state the physics engine keeps besides that of the bodies and joints.
+
+        Afterwards the world should behave exactly as a world whose bodies
+        and joints, with the same state, were created in the order given.
+        Engines that keep no such state need do nothing.
+
+        """
+
 
 class AbstractBody(object):
     def get_rotation(self):
@@ -70,6 +139,15 @@ class AbstractBody(object):
     def set_velocity(self, vel):
         raise NotImplementedError("AbstractPhysics.set_velocity()")
 
+    def get_velocity(self):
+        raise NotImplementedError("AbstractPhysics.get_velocity()")
+
+    def get_angular_velocity(self):
+        raise NotImplementedError("AbstractPhysics.get_angular_velocity()")
+
+    def set_angular_velocity(self, vel):
+        raise NotImplementedError("AbstractPhysics.set_angular_velocity()")
+
     def apply_force(self, force, world_point):
         raise NotImplementedError("AbstractPhysics.apply_force()")
 
@@ -79,14 +157,28 @@ class AbstractBody(object):
     def apply_torque(self, torque):
         raise NotImplementedError("AbstractPhysics.apply_torque()")
 
+    def is_sleeping(self):
+        """Return True if the physics engine has put the body to sleep.
+
+        Sleeping bodies are not simulated until something wakes them, so
+        callers should avoid nudging them needlessly.
+
+        """
+        return False
+
     def destroy(self):
         """Destroy the body and all joints."""
         raise NotImplementedError("AbstractPhysics.destroy()")
 
 
 class AbstractPhysics(object):
-    def create_world(self, gravity):
-        """Return a world, with constant gravity equal to gravity."""
+    def create_world(self, gravity, step=None):
+        """Return a world, with constant gravity equal to gravity.
+
+        If step is given, the world is always advanced in whole steps of that
+        many seconds, so that it behaves the same whatever the frame rate.
+
+        """
         raise NotImplementedError("AbstractPhysics.create_world()")
 
 
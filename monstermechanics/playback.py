@@ -0,0 +1,223 @@
+"""Headless playback of recorded matches.
+
+Playback re-runs a recording made by replay.Recorder without opening a window
+or drawing anything, as fast as the simulation will go, and checks the stored
+checksums, timer firings and inputs as it goes.
+
+The game canonicalizes its world every keyframe_interval ticks of the
+recording (see replay), and keyframes of the match state are taken at those
+ticks as playback passes them. A seek() restores the nearest keyframe at or
+before the target tick, unless playback is already between the two, and plays
+on from there; seeking past the keyframes taken so far plays only as far as
+the target, taking keyframes on the way. A restored keyframe carries on
+exactly as the recorded match did, so checksums are still verified after a
+seek.
+
+"""
+from __future__ import division, print_function
+
+import json
+import time
+
+from .game import Game
+from .monster import Monster
+from .timers import Scheduler
+from .replay import ReplayReader, unpack_controls
+
+
+class HeadlessGame(Game):
+    """A Game that runs without a window."""
+    def __init__(self, seed, filename=None, keyframe_interval=None):
+        super(HeadlessGame, self).__init__()
+        self.seed = seed
+        self.filename = filename
+        if keyframe_interval is not None:
+            self.keyframe_interval = keyframe_interval
+        # Designs read from disk during the current tick of the recording
+        self.designs = []
+
+    def start(self):
+        Monster.load_all()
+        self.create_world()
+
+    def show_message(self, fname, duration=None):
+        # The timer that clears the message is part of the recorded match
+        if duration is not None:
+            self.timers.set_timer(self.clear_message, duration)
+
+    def save(self):
+        """Playing back a match should not write saves."""
+
+    def choose_enemy(self, pick):
+        """The design is taken from the recording, whatever was chosen."""
+
+    def read_design(self, path):
+        """Return the next design that was read in the current tick of the recording."""
+        if not self.designs:
+            raise IOError("No design was read here when the match was recorded.")
+        design = self.designs.pop(0)
+        self.recorder.record_input('design', design)
+        return design
+
+
+class Keyframe(object):
+    """The state of a match at the start of a tick.
+
+    The world is captured with World.snapshot(), plus the match progress and
+    the display timers kept by the game.
+
+    """
+    def __init__(self, game):
+        self.tick = game.tick
+        self.enemy_number = game.enemy_number
+        self.level = game.level
+        self.own_enemies = game.own_enemies
+        self.time = game.timers.time
+        # Callbacks are stored by name, as the keyframe may be restored into
+        # a different game after Playback.reset()
+        self.timers = [(t.callback.__name__, t.when, t.interval) for t in game.timers.pending()]
+        self.snapshot = game.world.snapshot()
+
+    def restore(self, game):
+        """Return game to the state in this keyframe."""
+        game.tick = self.tick
+        game.enemy_number = self.enemy_number
+        game.level = self.level
+        game.own_enemies = self.own_enemies
+        game.timers = Scheduler()
+        game.timers.time = self.time
+        for name, when, interval in self.timers:
+            game.timers.schedule_at(getattr(game, name), when, interval)
+
+        game.world.restore(self.snapshot)
+        timers = game.world.timers
+        game.world.timers = Scheduler()
+        game.world.timers.time = timers.time
+        for t in timers.pending():
+            game.world.timers.schedule_at(self.rebind(game, t.callback), t.when, t.interval)
+        for m in game.world.monsters:
+            m.death_listeners = [getattr(game, l.__name__) for l in m.death_listeners]
+        player = game.world.get_player()
+        if player is not None:
+            game.monster = player
+
+
+    @staticmethod
+    def rebind(game, callback):
+        """Return callback, or the same method of game if it belongs to a game."""
+        if isinstance(getattr(callback, '__self__', None), Game):
+            return getattr(game, callback.__name__)
+        return callback
+
+
+class Verifier(object):
+    """Checks the ticks of a HeadlessGame against a recording.
+
+    This takes the place of the game's Recorder, so it sees exactly what the
+    Recorder saw when the match was recorded.
+
+    """
+    def __init__(self, playback):
+        self.playback = playback
+        self.events = []
+        self.inputs = []
+
+    def begin_tick(self, tick, control_state, dt):
+        self.events = []
+        self.inputs = []
+
+    def record_event(self, name):
+        self.events.append(name)
+
+    def record_input(self, kind, data):
+        self.inputs.append((kind, data))
+
+    def end_tick(self, world):
+        pb = self.playback
+        rec = pb.records[pb.game.tick]
+        if list(rec.events) != self.events:
+            pb.mismatch(rec.tick, 'events', rec.events, self.events)
+        if list(rec.inputs) != self.inputs:
+            pb.mismatch(rec.tick, 'inputs', rec.inputs, self.inputs)
+        if rec.checksum is not None:
+            checksum = world.checksum()
+            if checksum != rec.checksum:
+                pb.mismatch(rec.tick, 'checksum', rec.checksum, checksum)
+
+
+class Playback(object):
+    """Re-simulates a recorded match."""
+    def __init__(self, reader):
+        self.reader = reader
+        self.records = list(reader)
+        if self.records and self.records[0].tick != 0:
+            raise ValueError("Recording does not start at the beginning of the match.")
+        self.keyframe_interval = reader.keyframe_interval
+        self.keyframes = {}
+        self.mismatches = []
+        self.reset()
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        return cls(ReplayReader.open(path), **kwargs)
+
+    def reset(self):
+        """Restart playback from the beginning of the match."""
+        self.game = HeadlessGame(self.reader.seed, self.reader.filename, self.keyframe_interval)
+        self.game.start()
+        self.game.recorder = Verifier(self)
+
+    def mismatch(self, tick, what, expected, actual):
+        self.mismatches.append((tick, what, expected, actual))
+
+    def step(self):
+        """Play the next tick."""
+        game = self.game
+        rec = self.records[game.tick]
+        if game.tick % self.keyframe_interval == 0 and game.tick not in self.keyframes:
+            self.keyframes[game.tick] = Keyframe(game)
+        game.control_state = unpack_controls(rec.controls, len(game.control_state))
+        game.edits = [(kind, json.loads(data)) for kind, data in rec.inputs if kind in game.EDITS]
+        game.designs = [data for kind, data in rec.inputs if kind == 'design']
+        game.simulate(rec.dt)
+
+    def run(self, until=None):
+        """Play up to the given tick, or to the end of the recording.
+
+        Returns the number of ticks played per second of wall clock time.
+
+        """
+        if until is None:
+            until = len(self.records)
+        until = min(until, len(self.records))
+        start = time.time()
+        ticks = 0
+        while self.game.tick < until:
+            self.step()
+            ticks += 1
+        elapsed = time.time() - start
+        return ticks / elapsed if elapsed > 0 else float('inf')
+
+    def seek(self, tick):
+        """Jump to the start of the given tick."""
+        tick = min(tick, len(self.records))
+        earlier = [t for t in self.keyframes if t <= tick]
+        if earlier:
+            kf = max(earlier)
+            if not kf <= self.game.tick <= tick:
+                self.keyframes[kf].restore(self.game)
+        self.run(tick)
+
+
+def play(path, seek=None):
+    """Play back a recording from the command line, reporting any desyncs."""
+    pb = Playback.open(path)
+    if seek is not None:
+        pb.seek(seek)
+        print("Jumped to tick %d" % pb.game.tick)
+    start = pb.game.tick
+    rate = pb.run()
+    print("Played %d ticks at %.0f ticks/s" % (pb.game.tick - start, rate))
+    for tick, what, expected, actual in pb.mismatches:
+        print("Tick %d: %s mismatch, recorded %r, got %r" % (tick, what, expected, actual))
+    return not pb.mismatches
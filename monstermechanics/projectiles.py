@@ -22,6 +22,8 @@ class Thistle(Actor):
 
     DAMAGE = 25, 50, 100
 
+    SNAPSHOT_ATTRS = ('level', 'multiplier', 'age')
+
     def set_level(self, l):
         self.level = l
         self.set_part('level%d' % self.level)
@@ -35,6 +37,7 @@ class Thistle(Actor):
             part = enemy.colliding(self)
             if part:
                 self.on_hit(part)
+                return
 
     def get_damage(self):
         return self.DAMAGE[self.level - 1] * self.multiplier
@@ -54,6 +57,8 @@ class Blood(Actor):
     age = 0
     MAX_AGE = 3
 
+    SNAPSHOT_ATTRS = ('age',)
+
     def update(self, dt):
         self.age += dt
         if self.age > self.MAX_AGE:
@@ -0,0 +1,281 @@
+"""Recording of matches so that they can be re-simulated exactly.
+
+A recording is a header followed by one record per tick. Each record starts
+with a flags byte saying which fields follow; fields are only written when they
+differ from the previous tick, so a tick where the player is not touching the
+keyboard and the frame rate is steady costs a single byte.
+
+Records are grouped into chunks. The first record of a chunk is always written
+in full, so chunks can be decoded independently of each other; when recording
+to memory only the most recent MAX_CHUNKS chunks are kept.
+
+Randomness is made reproducible by reseeding the world's random number
+generator at the start of every tick from the match seed (see tick_seed()), so
+the seed in the header is all that is needed to reproduce AI decisions and
+blood spatter. Anything else that comes from outside the simulation - parts
+the player attaches or upgrades with the mouse, and monster designs read from
+disk - is stored as an input of the tick it took effect in.
+
+Every KEYFRAME_INTERVAL ticks the game canonicalizes its world (see
+World.canonicalize()) before simulating the tick, so that playback can restore
+a snapshot taken there and carry on exactly as the recorded match did. The
+interval is stored in the header.
+
+"""
+import struct
+from collections import deque, namedtuple
+
+MAGIC = b'MMRP'
+VERSION = 4
+
+# Bits in the flags byte at the start of each tick record
+F_CONTROLS = 0x01
+F_DT = 0x02
+F_CHECKSUM = 0x04
+F_EVENTS = 0x08
+F_INPUTS = 0x10
+F_CHUNK = 0x80
+
+# Take a state checksum every this many ticks
+CHECKSUM_INTERVAL = 30
+
+# Canonicalize the world every this many ticks
+KEYFRAME_INTERVAL = 300
+
+# Number of ticks in a chunk, and chunks to retain when recording to memory
+CHUNK_TICKS = 600
+MAX_CHUNKS = 60
+
+HEADER = struct.Struct('<4sBIHH')
+CHUNK_HEADER = struct.Struct('<I')
+CONTROLS = struct.Struct('<H')
+DT = struct.Struct('<d')
+CHECKSUM = struct.Struct('<I')
+STRING_LENGTH = struct.Struct('<H')
+TEXT_LENGTH = struct.Struct('<I')
+# Number of events or inputs in a tick
+COUNT = struct.Struct('<H')
+
+
+TickRecord = namedtuple('TickRecord', 'tick controls dt checksum events inputs')
+
+
+def tick_seed(seed, tick):
+    """Derive the random seed for the given tick of a match."""
+    return (seed * 1000003 + tick) & 0xffffffff
+
+
+def pack_controls(control_state):
+    """Pack a list of control flags into an integer."""
+    bits = 0
+    for i, pressed in enumerate(control_state):
+        if pressed:
+            bits |= 1 << i
+    return bits
+
+
+def unpack_controls(bits, count):
+    """Unpack an integer from pack_controls() into a list of count flags."""
+    return [bool(bits & (1 << i)) for i in range(count)]
+
+
+def pack_string(s):
+    s = (s or '').encode('utf8')
+    return STRING_LENGTH.pack(len(s)) + s
+
+
+def pack_text(s):
+    """Pack a string that may be longer than pack_string() allows."""
+    s = s.encode('utf8')
+    return TEXT_LENGTH.pack(len(s)) + s
+
+
+class Recorder(object):
+    """Records the inputs to a match, tick by tick.
+
+    If out is given, it should be a file opened for binary writing; completed
+    chunks are written to it as they are finished. Otherwise the recording is
+    kept in memory, bounded to the last MAX_CHUNKS chunks.
+
+    """
+    def __init__(self, seed, filename=None, out=None, checksum_interval=CHECKSUM_INTERVAL,
+                 keyframe_interval=KEYFRAME_INTERVAL):
+        self.seed = seed
+        self.filename = filename
+        self.out = out
+        self.checksum_interval = checksum_interval
+        self.keyframe_interval = keyframe_interval
+        self.header = HEADER.pack(MAGIC, VERSION, seed, checksum_interval, keyframe_interval) + pack_string(filename)
+        self.chunks = deque(maxlen=MAX_CHUNKS)
+        if self.out is not None:
+            self.out.write(self.header)
+        self.chunk = None
+        self.chunk_ticks = 0
+        self.last_controls = None
+        self.last_dt = None
+        self.tick = None
+        self.events = []
+        self.inputs = []
+
+    def begin_tick(self, tick, control_state, dt):
+        """Record the inputs for the start of a tick."""
+        if self.chunk is None:
+            self.chunk = bytearray(CHUNK_HEADER.pack(tick))
+            self.last_controls = None
+            self.last_dt = None
+        self.tick = tick
+        self.controls = pack_controls(control_state)
+        self.dt = dt
+        self.events = []
+        self.inputs = []
+
+    def record_event(self, name):
+        """Record that something external to the simulation, such as a timer, fired."""
+        self.events.append(name)
+
+    def record_input(self, kind, data):
+        """Record an input from outside the simulation, such as an edit to the player's monster.
+
+        kind names the input, and data is a string holding its details.
+
+        """
+        self.inputs.append((kind, data))
+
+    def end_tick(self, world):
+        """Write the record for the current tick."""
+        flags = 0
+        payload = []
+        if self.controls != self.last_controls:
+            flags |= F_CONTROLS
+            payload.append(CONTROLS.pack(self.controls))
+            self.last_controls = self.controls
+        if self.dt != self.last_dt:
+            flags |= F_DT
+            payload.append(DT.pack(self.dt))
+            self.last_dt = self.dt
+        if self.tick % self.checksum_interval == 0:
+            flags |= F_CHECKSUM
+            payload.append(CHECKSUM.pack(world.checksum()))
+        if self.events:
+            flags |= F_EVENTS
+            payload.append(COUNT.pack(len(self.events)))
+            payload.extend(pack_string(e) for e in self.events)
+        if self.inputs:
+            flags |= F_INPUTS
+            payload.append(COUNT.pack(len(self.inputs)))
+            for kind, data in self.inputs:
+                payload.append(pack_string(kind))
+                payload.append(pack_text(data))
+        self.chunk.append(flags)
+        for p in payload:
+            self.chunk.extend(p)
+
+        self.chunk_ticks += 1
+        if self.chunk_ticks >= CHUNK_TICKS:
+            self.flush()
+
+    def flush(self):
+        """Finish the current chunk."""
+        if self.chunk is None:
+            return
+        chunk = bytes(self.chunk)
+        if self.out is not None:
+            self.out.write(struct.pack('<BI', F_CHUNK, len(chunk)))
+            self.out.write(chunk)
+        else:
+            self.chunks.append(chunk)
+        self.chunk = None
+        self.chunk_ticks = 0
+
+    def close(self):
+        self.flush()
+        if self.out is not None:
+            self.out.close()
+
+    def getvalue(self):
+        """Return the in-memory recording as a byte string."""
+        self.flush()
+        data = [self.header]
+        for chunk in self.chunks:
+            data.append(struct.pack('<BI', F_CHUNK, len(chunk)))
+            data.append(chunk)
+        return b''.join(data)
+
+
+class ReplayReader(object):
+    """Decodes a recording produced by Recorder."""
+    def __init__(self, data):
+        self.data = data
+        magic, version, self.seed, self.checksum_interval, self.keyframe_interval = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a Monster Mechanics recording.")
+        pos = HEADER.size
+        self.filename, pos = self.read_string(pos)
+        self.filename = self.filename or None
+        self.start = pos
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def read_string(self, pos):
+        l = STRING_LENGTH.unpack_from(self.data, pos)[0]
+        pos += STRING_LENGTH.size
+        return self.data[pos:pos + l].decode('utf8'), pos + l
+
+    def read_text(self, pos):
+        l = TEXT_LENGTH.unpack_from(self.data, pos)[0]
+        pos += TEXT_LENGTH.size
+        return self.data[pos:pos + l].decode('utf8'), pos + l
+
+    def chunks(self):
+        """Iterate over the (start tick, offset, end) of each chunk."""
+        pos = self.start
+        while pos < len(self.data):
+            flag, length = struct.unpack_from('<BI', self.data, pos)
+            if flag != F_CHUNK:
+                raise ValueError("Corrupt recording at offset %d." % pos)
+            pos += 5
+            tick = CHUNK_HEADER.unpack_from(self.data, pos)[0]
+            yield tick, pos + CHUNK_HEADER.size, pos + length
+            pos += length
+
+    def __iter__(self):
+        """Iterate over every recorded tick as a TickRecord."""
+        data = self.data
+        for tick, pos, end in self.chunks():
+            controls = 0
+            dt = None
+            while pos < end:
+                flags = ord(data[pos:pos + 1])
+                pos += 1
+                checksum = None
+                events = ()
+                inputs = ()
+                if flags & F_CONTROLS:
+                    controls = CONTROLS.unpack_from(data, pos)[0]
+                    pos += CONTROLS.size
+                if flags & F_DT:
+                    dt = DT.unpack_from(data, pos)[0]
+                    pos += DT.size
+                if flags & F_CHECKSUM:
+                    checksum = CHECKSUM.unpack_from(data, pos)[0]
+                    pos += CHECKSUM.size
+                if flags & F_EVENTS:
+                    n = COUNT.unpack_from(data, pos)[0]
+                    pos += COUNT.size
+                    events = []
+                    for i in range(n):
+                        e, pos = self.read_string(pos)
+                        events.append(e)
+                if flags & F_INPUTS:
+                    n = COUNT.unpack_from(data, pos)[0]
+                    pos += COUNT.size
+                    inputs = []
+                    for i in range(n):
+                        kind, pos = self.read_string(pos)
+                        text, pos = self.read_text(pos)
+                        inputs.append((kind, text))
+                yield TickRecord(tick, controls, dt, checksum, events, inputs)
+                tick += 1
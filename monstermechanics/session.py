@@ -0,0 +1,222 @@
+"""Keeping a world in step with its copy in another process.
+
+Each process owns the inputs of one monster and sends them to the other as
+they are made. The local player's inputs take effect at once: the remote
+player's inputs for ticks that have not arrived yet are predicted by repeating
+the last ones received, and when the real ones arrive and turn out different,
+the world is rolled back to the last snapshot taken before the first wrong
+tick and simulated forward again to the present.
+
+For the two copies of the match to agree, every tick is exactly DT long, the
+physics is stepped in fixed steps, and the random number generator is reseeded
+every tick as for recordings. Box2D keeps some state that snapshots cannot
+capture (see snapshot), so both processes canonicalize the world every
+ROLLBACK_INTERVAL ticks, whether they will need to roll back or not, and only
+snapshots taken there are restored. A rolled back world then carries on
+exactly as the other process's copy did. Each packet also carries the checksum
+of the latest tick for which the sender has both players' inputs, so that the
+copies drifting apart anyway is noticed.
+
+The transport only has to send and receive whole packets; see
+netplay.UDPTransport.
+
+"""
+from __future__ import division
+
+import struct
+
+from .controls import Control
+from .replay import tick_seed
+
+# Length of a tick in seconds
+DT = 1 / 60
+
+# Team of the monster owned by each side
+TEAMS = ('player', 'enemy')
+
+# How many ticks the simulation may run ahead of the remote player's inputs
+# before it waits for them
+MAX_ROLLBACK = 8
+
+# The world is canonicalized and snapshotted every this many ticks
+ROLLBACK_INTERVAL = 4
+
+# Ticks of checksums to keep for comparison with the remote ones
+CHECKSUM_HISTORY = 120
+
+# Packets holding inputs start with this; packets of other kinds are ignored
+INPUTS = b'I'
+
+# The latest tick the sender has simulated with every input, with its
+# checksum, followed by the first tick and number of the sender's inputs
+HEADER = struct.Struct('<ciIIB')
+CONTROLS = struct.Struct('<H')
+
+# Inputs sent in one packet, at most; every input the remote player has not
+# acknowledged is sent again each tick
+MAX_INPUTS = 255
+
+
+def apply_controls(monster, bits):
+    """Drive monster from packed controls, as Game.simulate() drives the player."""
+    if bits & 1 << Control.MoveLeft:
+        monster.left()
+    elif bits & 1 << Control.MoveRight:
+        monster.right()
+    if bits & 1 << Control.Attack:
+        monster.attack()
+
+
+def forget(d, tick):
+    """Remove the entries for ticks before tick from d."""
+    for t in [t for t in d if t < tick]:
+        del d[t]
+
+
+def rollback_point(tick):
+    """Return the latest tick at or before tick whose snapshot can be restored."""
+    return tick - tick % ROLLBACK_INTERVAL
+
+
+class Session(object):
+    """Keeps a world in step with its copy in another process."""
+    def __init__(self, world, seed, side, transport):
+        self.world = world
+        self.seed = seed
+        self.side = side
+        self.transport = transport
+        self.tick = 0
+        self.local_inputs = {}
+        self.remote_inputs = {}
+        # The remote input each tick was last simulated with
+        self.predicted = {}
+        # Every remote input up to confirmed has arrived, and the remote
+        # player has simulated every local one up to acked
+        self.confirmed = -1
+        self.acked = -1
+        # Snapshots taken at the start of every ROLLBACK_INTERVAL'th tick
+        # that could still be rolled back to
+        self.snapshots = {}
+        self.checksums = {}
+        self.remote_checksum = None
+        self.checked = -1
+        # Teams with monsters left at the end of each tick
+        self.survivors = {}
+        self.rollbacks = 0
+        self.desyncs = []
+
+    def advance(self, bits):
+        """Simulate the next tick with bits as the local player's input.
+
+        Return False without simulating it if the remote player's inputs are
+        too far behind.
+
+        """
+        self.poll()
+        if self.tick - self.confirmed > MAX_ROLLBACK:
+            self.send()
+            return False
+        self.local_inputs[self.tick] = bits
+        self.simulate(self.tick)
+        self.tick += 1
+        self.send()
+        return True
+
+    def remote_input(self, tick):
+        try:
+            return self.remote_inputs[tick]
+        except KeyError:
+            return self.remote_inputs.get(self.confirmed, 0)
+
+    def simulate(self, tick):
+        world = self.world
+        if tick % ROLLBACK_INTERVAL == 0:
+            world.canonicalize()
+            self.snapshots[tick] = world.snapshot()
+        remote = self.predicted[tick] = self.remote_input(tick)
+        inputs = [remote, remote]
+        inputs[self.side] = self.local_inputs[tick]
+        world.random.seed(tick_seed(self.seed, tick))
+        for team, bits in zip(TEAMS, inputs):
+            for m in world.teams.get(team, ()):
+                apply_controls(m, bits)
+        world.update(DT)
+        self.checksums[tick] = world.checksum()
+        self.survivors[tick] = frozenset(world.teams)
+
+    def rollback(self, tick):
+        """Re-simulate from before the start of tick up to the present."""
+        start = rollback_point(tick)
+        self.world.restore(self.snapshots[start])
+        for t in range(start, self.tick):
+            self.simulate(t)
+        self.rollbacks += 1
+
+    def send(self):
+        first = self.acked + 1
+        last = min(self.tick, first + MAX_INPUTS)
+        settled = self.get_settled()
+        packet = [HEADER.pack(INPUTS, settled, self.checksums.get(settled, 0), first, last - first)]
+        for t in range(first, last):
+            packet.append(CONTROLS.pack(self.local_inputs[t]))
+        self.transport.send(b''.join(packet))
+
+    def poll(self):
+        """Take in the packets that have arrived, rolling back if need be."""
+        wrong = None
+        for data in self.transport.receive():
+            try:
+                kind, settled, checksum, first, count = HEADER.unpack_from(data)
+            except struct.error:
+                continue
+            if kind != INPUTS or len(data) != HEADER.size + count * CONTROLS.size:
+                continue
+            if settled > self.acked:
+                self.acked = settled
+                self.remote_checksum = settled, checksum
+            for i in range(count):
+                t = first + i
+                if t <= self.confirmed or t in self.remote_inputs:
+                    continue
+                bits = CONTROLS.unpack_from(data, HEADER.size + i * CONTROLS.size)[0]
+                self.remote_inputs[t] = bits
+                if t < self.tick and self.predicted[t] != bits and (wrong is None or t < wrong):
+                    wrong = t
+
+        while self.confirmed + 1 in self.remote_inputs:
+            self.confirmed += 1
+        if wrong is not None:
+            self.rollback(wrong)
+        self.check()
+
+        # The remote player may be ahead, so keep everything after the last
+        # tick simulated with every input, and the inputs from the snapshot
+        # a rollback would restore
+        settled = self.get_settled()
+        start = rollback_point(settled + 1)
+        forget(self.snapshots, start)
+        forget(self.predicted, settled + 1)
+        forget(self.remote_inputs, min(start, settled))
+        forget(self.local_inputs, min(start, self.acked + 1))
+        forget(self.checksums, settled - CHECKSUM_HISTORY)
+        forget(self.survivors, settled)
+
+    def get_settled(self):
+        """Return the latest tick simulated with every input, which cannot be rolled back."""
+        return min(self.confirmed, self.tick - 1)
+
+    def check(self):
+        """Compare the remote player's latest checksum with ours, once ours is final."""
+        if self.remote_checksum is None:
+            return
+        tick, checksum = self.remote_checksum
+        if tick > self.get_settled() or tick <= self.checked:
+            return
+        self.checked = tick
+        ours = self.checksums.get(tick)
+        if ours is not None and ours != checksum:
+            self.desyncs.append(tick)
+
+    def get_survivors(self):
+        """Return the teams left at the settled tick, or None."""
+        return self.survivors.get(self.get_settled())
@@ -0,0 +1,269 @@
+"""In-memory snapshots of the complete state of a World.
+
+A snapshot is split in two. The Structure records which actors, monsters and
+joints exist, and how to recreate them; it only changes when something is
+spawned, destroyed, attached or detached, so successive snapshots usually
+share it. Everything else - the bodies' positions and velocities, the per-part
+state named by each class's SNAPSHOT_ATTRS, joint motor speeds and monster
+mutagen - is packed into a flat array of doubles.
+
+Restoring a snapshot into a world whose structure has not changed since it was
+taken just writes the values back. Otherwise the world's actors and monsters
+are torn down and rebuilt from the structure first.
+
+State that the physics engine keeps internally, such as contacts and their
+impulses and how long bodies have been still, cannot be captured. Instead
+restoring resets the physics world (see AbstractWorld.reset()), discarding
+that state and recreating the bodies and joints in a fixed order. So a
+restored world does not carry on exactly as the original would have, but
+restoring the same snapshot always gives a world that behaves the same, and
+World.canonicalize() puts a running world into that same state. A world that
+is canonicalized whenever it is snapshotted can be restored exactly.
+
+Cosmetic actors without bodies, such as damage numbers, are left alone, or
+dropped if the world has to be rebuilt.
+
+"""
+import copy
+import itertools
+from array import array
+
+from .vector import v
+from .timers import Scheduler
+from .monster import Monster
+
+# Number of values stored for each body: x, y, angle, vx, vy, angular velocity
+BODY_VALUES = 6
+
+# How to convert attributes back from doubles, where float will not do
+CONVERT = {
+    'level': int,
+    'cost': int,
+    'attack_ready': bool,
+}
+
+
+def bodies_of(actor):
+    """Return the physics bodies of actor."""
+    try:
+        subparts = actor.subparts
+    except AttributeError:
+        return [actor.body]
+    return [sp.body for sp in subparts()]
+
+
+class Structure(object):
+    """The objects in a world, and what is needed to recreate them."""
+    def __init__(self, world):
+        self.version = world.structure_version
+        self.bodied = [a for a in world.actors if a.body is not None]
+        self.attrs = [a.SNAPSHOT_ATTRS for a in self.bodied]
+        self.monsters = list(world.monsters)
+        self.parts = [list(m.parts) for m in self.monsters]
+        self.joints = []
+        joints = []
+        index = dict((a, i) for i, a in enumerate(self.bodied))
+        for parts in self.parts:
+            for p in parts:
+                for c, j in p._joints:
+                    self.joints.append(j)
+                    joints.append((index[p], index[c], j.to_json()))
+
+        # Every joint whose motor speed is captured: those between parts, and
+        # those within parts with several bodies, such as Arm's
+        self.motors = []
+        seen = set()
+        for a in self.bodied:
+            for b in bodies_of(a):
+                for j in b.joints:
+                    if j not in seen:
+                        seen.add(j)
+                        self.motors.append(j)
+
+        # Offset of each actor's values in the data array
+        self.offsets = []
+        size = 0
+        for a, attrs in zip(self.bodied, self.attrs):
+            self.offsets.append(size)
+            size += len(bodies_of(a)) * BODY_VALUES + len(attrs)
+        self.size = size
+
+        self.recipe = {
+            'actors': [(type(a), a.name) for a in self.bodied],
+            'joints': joints,
+            'monsters': [
+                (m.name, [index[p] for p in parts], list(m.death_listeners))
+                for m, parts in zip(self.monsters, self.parts)
+            ],
+        }
+
+
+class Snapshot(object):
+    """The state of a world at the start of a tick."""
+    def __init__(self, world):
+        st = world._structure
+        if st is None or st.version != world.structure_version:
+            st = world._structure = Structure(world)
+        self.structure = st
+
+        data = array('d')
+        for a, attrs in zip(st.bodied, st.attrs):
+            for b in bodies_of(a):
+                x, y = b.get_position()
+                vx, vy = b.get_velocity()
+                data.extend((x, y, b.get_rotation(), vx, vy, b.get_angular_velocity()))
+            for k in attrs:
+                data.append(getattr(a, k, 0))
+        for j in st.motors:
+            data.append(j.motor_speed)
+        for m in st.monsters:
+            data.extend((m.mutagen, m.moving, m.phase))
+        self.data = data
+
+        self.monsters = [self.capture_monster(m) for m in st.monsters]
+        self.tick = world.tick
+        self.time = world.time
+        self.ai_count = world.ai_count
+        self.origin = world.origin
+        self.accumulator = world.world.accumulator
+        self.random = world.random.getstate()
+        self.timer_time = world.timers.time
+        self.timers = [(t.callback, t.when, t.interval) for t in world.timers.pending()]
+
+    def capture_monster(self, m):
+        seq = next(m.weapon_seq)
+        m.weapon_seq = itertools.count(seq)
+        controller = m.controller
+        if controller is not None:
+            controller = controller, self.copy_controller_state(controller.__dict__)
+        return list(m.ready_weapons), seq, controller
+
+    @staticmethod
+    def copy_controller_state(state):
+        state = dict(state)
+        if state.get('strategy') is not None:
+            state['strategy'] = copy.copy(state['strategy'])
+        return state
+
+    def restore(self, world):
+        """Put world back into the state captured in this snapshot."""
+        st = self.structure
+        mapping = None
+        if world._structure is not st or world.structure_version != st.version:
+            # Map the objects in the snapshot to their replacements
+            old = st
+            st = self.rebuild(world)
+            mapping = dict(zip(old.monsters, st.monsters))
+            for old_parts, parts in zip(old.parts, st.parts):
+                mapping.update(zip(old_parts, parts))
+
+        data = self.data
+        for a, attrs, i in zip(st.bodied, st.attrs, st.offsets):
+            for b in bodies_of(a):
+                x, y, angle, vx, vy, av = data[i:i + BODY_VALUES]
+                i += BODY_VALUES
+                b.set_position(v(x, y))
+                b.set_rotation(angle)
+                b.set_velocity(v(vx, vy))
+                b.set_angular_velocity(av)
+            self.restore_attrs(a, attrs, i)
+        i = st.size
+        for j in st.motors:
+            j.set_motor_speed(data[i])
+            i += 1
+        for m, ms in zip(st.monsters, self.monsters):
+            m.mutagen, moving, m.phase = data[i:i + 3]
+            m.moving = int(moving)
+            i += 3
+            self.restore_monster(m, ms, mapping)
+            m.invalidate_geometry()
+
+        world.tick = self.tick
+        world.time = self.time
+        world.ai_count = self.ai_count
+        world.origin = self.origin
+        world.world.accumulator = self.accumulator
+        world.world.reset([b for a in st.bodied for b in bodies_of(a)], st.motors)
+        world.random.setstate(self.random)
+        world.timers = Scheduler()
+        world.timers.time = self.timer_time
+        for callback, when, interval in self.timers:
+            world.timers.schedule_at(callback, when, interval)
+        world.damage_events = []
+
+    def restore_attrs(self, a, attrs, i):
+        """Restore the SNAPSHOT_ATTRS of actor a, stored from offset i."""
+        for k in attrs:
+            value = CONVERT.get(k, float)(self.data[i])
+            i += 1
+            if getattr(a, k, 0) == value:
+                continue
+            if k == 'scale':
+                a.set_scale(value)
+            else:
+                setattr(a, k, value)
+                if k == 'level':
+                    a.set_part('level%d' % value)
+
+    def restore_monster(self, m, ms, mapping):
+        ready_weapons, seq, controller = ms
+        if mapping is not None:
+            # entries for parts that have since died are dropped
+            ready_weapons = [(t, s, mapping[p]) for t, s, p in ready_weapons if p in mapping]
+        m.ready_weapons = list(ready_weapons)
+        m.weapon_seq = itertools.count(seq)
+        if controller is None:
+            m.controller = None
+            return
+        ctrl, state = controller
+        state = self.copy_controller_state(state)
+        if mapping is not None:
+            ctrl = m.controller
+            for k, val in state.items():
+                try:
+                    state[k] = mapping.get(val, val)
+                except TypeError:
+                    # unhashable, so not one of the mapped objects
+                    pass
+            state['world'] = m.world
+        ctrl.__dict__.clear()
+        ctrl.__dict__.update(state)
+        if ctrl.strategy is not None:
+            ctrl.strategy.controller = ctrl
+            ctrl.strategy.monster = m
+        m.controller = ctrl
+
+    def rebuild(self, world):
+        """Recreate the actors and monsters of the structure in world."""
+        recipe = self.structure.recipe
+        for m in list(world.monsters):
+            world.remove_monster(m)
+        world.destroy_many(list(world.actors))
+
+        actors = []
+        for (cls, name), i in zip(recipe['actors'], self.structure.offsets):
+            actors.append(cls(v(self.data[i], self.data[i + 1]), name))
+        world.spawn_many(actors)
+        # The recipe's joint anchors are scaled to the parts' sizes, so the
+        # parts must have their sizes before the joints are made
+        for a, attrs, i in zip(actors, self.structure.attrs, self.structure.offsets):
+            self.restore_attrs(a, attrs, i + len(bodies_of(a)) * BODY_VALUES)
+
+        joints = world.world.restore_joints([
+            (actors[i1].body, actors[i2].body, js) for i1, i2, js in recipe['joints']
+        ])
+        for (i1, i2, js), joint in zip(recipe['joints'], joints):
+            actors[i1]._joints.append((actors[i2], joint))
+            actors[i2]._parent = actors[i1]
+
+        for (name, parts, listeners), ms in zip(recipe['monsters'], self.monsters):
+            m = Monster(world, [actors[i] for i in parts], name=name)
+            for l in listeners:
+                m.add_death_listener(l)
+            controller = ms[2]
+            if controller is not None:
+                m.set_controller(type(controller[0])(world, m, name))
+            world.add_monster(m)
+
+        st = world._structure = Structure(world)
+        return st
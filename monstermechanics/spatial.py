@@ -0,0 +1,49 @@
+"""Spatial indexing for finding things near a point."""
+import math
+
+
+class SpatialHash(object):
+    """A uniform grid of buckets, for finding circles near a point.
+
+    Each item is stored in every cell its circle overlaps, so a query only has
+    to look at the cells overlapped by the query circle. Queries may return the
+    same item more than once.
+
+    """
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells = {}
+
+    def cell_range(self, x, y, r):
+        cs = self.cell_size
+        floor = math.floor
+        return (
+            int(floor((x - r) / cs)), int(floor((x + r) / cs)),
+            int(floor((y - r) / cs)), int(floor((y + r) / cs))
+        )
+
+    def insert(self, x, y, r, item):
+        """Add item, which occupies the circle of radius r centred on (x, y)."""
+        cells = self.cells
+        i1, i2, j1, j2 = self.cell_range(x, y, r)
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                try:
+                    cells[i, j].append(item)
+                except KeyError:
+                    cells[i, j] = [item]
+
+    def query(self, x, y, r=0):
+        """Return the items that may overlap the circle of radius r centred on (x, y)."""
+        cells = self.cells
+        i1, i2, j1, j2 = self.cell_range(x, y, r)
+        if i1 == i2 and j1 == j2:
+            return cells.get((i1, j1), [])
+        found = []
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                found.extend(cells.get((i, j), []))
+        return found
@@ -0,0 +1,111 @@
+"""Scheduling of callbacks in game time.
+
+Timers are kept in a heap ordered by the absolute game time at which they are
+due, so setting a timer costs O(log n) and a tick where nothing is due costs
+a single comparison. Cancelled timers are left in the heap and skipped when
+they come up, and the heap is compacted if too many of them build up.
+
+"""
+import heapq
+import itertools
+
+# Compact the heap when it holds at least this many cancelled timers, and
+# they outnumber the live ones
+COMPACT_THRESHOLD = 64
+
+
+class Timer(object):
+    """A handle to a scheduled callback, which can be used to cancel it."""
+    __slots__ = ['callback', 'when', 'interval', 'cancelled']
+
+    def __init__(self, callback, when, interval=None):
+        self.callback = callback
+        self.when = when
+        self.interval = interval
+        self.cancelled = False
+
+
+class Scheduler(object):
+    """Fires callbacks when the game time reaches the time they are due."""
+    def __init__(self):
+        self.time = 0
+        self.queue = []
+        self.seq = itertools.count()
+        # Live timers by callback, so that they can be cancelled by callback
+        self.by_callback = {}
+        self.cancelled = 0
+
+    def __len__(self):
+        return len(self.queue) - self.cancelled
+
+    def set_timer(self, callback, duration, interval=None):
+        """Call callback after duration seconds.
+
+        If interval is given, the callback is then called again every
+        interval seconds until the timer is cancelled.
+
+        """
+        return self.schedule_at(callback, self.time + duration, interval)
+
+    def schedule_at(self, callback, when, interval=None):
+        """Call callback when the game time reaches when."""
+        if interval is not None and interval <= 0:
+            raise ValueError("Repeating timers need a positive interval.")
+        timer = Timer(callback, when, interval)
+        heapq.heappush(self.queue, (when, next(self.seq), timer))
+        self.by_callback.setdefault(callback, []).append(timer)
+        return timer
+
+    def cancel(self, timer):
+        if timer.cancelled:
+            return
+        timer.cancelled = True
+        self.cancelled += 1
+        timers = self.by_callback[timer.callback]
+        timers.remove(timer)
+        if not timers:
+            del self.by_callback[timer.callback]
+        if self.cancelled >= COMPACT_THRESHOLD and self.cancelled * 2 > len(self.queue):
+            self.compact()
+
+    def unset_timer(self, callback):
+        """Cancel every timer for callback."""
+        for timer in list(self.by_callback.get(callback, ())):
+            self.cancel(timer)
+
+    def compact(self):
+        # In place, as due() may be iterating over the queue
+        self.queue[:] = [e for e in self.queue if not e[2].cancelled]
+        heapq.heapify(self.queue)
+        self.cancelled = 0
+
+    def pending(self):
+        """Return the live timers, in the order they will fire."""
+        return [e[2] for e in sorted(self.queue) if not e[2].cancelled]
+
+    def advance(self, dt):
+        self.time += dt
+
+    def due(self):
+        """Generate the callbacks that are due, in order.
+
+        Timers set by the callbacks fire in the same pass if they are already
+        due.
+
+        """
+        queue = self.queue
+        while queue and queue[0][0] <= self.time:
+            when, seq, timer = heapq.heappop(queue)
+            if timer.cancelled:
+                self.cancelled -= 1
+                continue
+            if timer.interval is None:
+                timer.cancelled = True
+                timers = self.by_callback[timer.callback]
+                timers.remove(timer)
+                if not timers:
+                    del self.by_callback[timer.callback]
+            else:
+                timer.when = when + timer.interval
+                heapq.heappush(queue, (timer.when, next(self.seq), timer))
+            yield timer.callback
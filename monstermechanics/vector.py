@@ -34,6 +34,11 @@ from __future__ import division
 import math
 import weakref
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def cached(func):
     """Decorate a function as a caching property.
@@ -68,7 +73,12 @@ def cached(func):
 class Vector(tuple):
     """Two-dimensional float vector implementation.
 
+    Vectors are created in huge numbers, so they carry no instance dictionary;
+    derived quantities such as the length are recomputed on each access rather
+    than cached.
+
     """
+    __slots__ = ()
 
     def __str__(self):
         """Construct a concise string representation.
@@ -96,22 +106,23 @@ class Vector(tuple):
         """
         return self[1]
 
-    @cached
+    @property
     def length(self):
         """The length of the vector.
 
         """
-        return math.sqrt(self.length2)
+        vx, vy = self
+        return math.sqrt(vx * vx + vy * vy)
 
-    @cached
+    @property
     def length2(self):
         """The square of the length of the vector.
 
         """
         vx, vy = self
-        return vx ** 2 + vy ** 2
+        return vx * vx + vy * vy
 
-    @cached
+    @property
     def angle(self):
         """The angle the vector makes to the positive x axis in the range
         (-180, 180].
@@ -255,10 +266,8 @@ class Vector(tuple):
 
         """
         vx, vy = self
-        s = length / self.length
-        v = Vector((vx * s, vy * s))
-        v.length = length
-        return v
+        s = length / math.sqrt(vx * vx + vy * vy)
+        return Vector((vx * s, vy * s))
 
     def safe_scaled_to(self, length):
         """Compute the vector scaled to a given length, or just return the
@@ -278,10 +287,8 @@ class Vector(tuple):
 
         """
         vx, vy = self
-        l = self.length
-        v = Vector((vx / l, vy / l))
-        v.length = 1.0
-        return v
+        l = math.sqrt(vx * vx + vy * vy)
+        return Vector((vx / l, vy / l))
 
     def safe_normalised(self):
         """Compute the vector scaled to unit length, or just return the vector
@@ -800,6 +807,314 @@ class Rectangle(object):
         return cls(lo, hi)
 
 
+class ListVectorArray(object):
+    """An array of two-dimensional vectors that are transformed together.
+
+    This is the pure Python implementation, used when NumPy is not available.
+    Use VectorArray, which is the best implementation available.
+
+    """
+
+    def __init__(self, points):
+        """Create a VectorArray.
+
+        :Parameters:
+            `points` : iterable of Vector
+                The vectors in the array.
+
+        """
+        self.points = [(x, y) for x, y in points]
+
+    def __repr__(self):
+        """Construct a precise string representation.
+
+        """
+        return "VectorArray(%r)" % (self.points,)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        """Iterate over the vectors in the array.
+
+        """
+        for p in self.points:
+            yield Vector(p)
+
+    def __getitem__(self, i):
+        return Vector(self.points[i])
+
+    def tolist(self):
+        """Return the vectors in the array as a list.
+
+        """
+        return [Vector(p) for p in self.points]
+
+    def __add__(self, other):
+        """Translate every vector by a vector, or add two arrays elementwise.
+
+        :Parameters:
+            `other` : Vector or VectorArray
+                The object to add.
+
+        """
+        if isinstance(other, ListVectorArray):
+            return ListVectorArray((x + ox, y + oy) for (x, y), (ox, oy) in zip(self.points, other.points))
+        ox, oy = other
+        return ListVectorArray((x + ox, y + oy) for x, y in self.points)
+
+    def __sub__(self, other):
+        """Translate every vector by the negation of a vector, or subtract two
+        arrays elementwise.
+
+        :Parameters:
+            `other` : Vector or VectorArray
+                The object to subtract.
+
+        """
+        if isinstance(other, ListVectorArray):
+            return ListVectorArray((x - ox, y - oy) for (x, y), (ox, oy) in zip(self.points, other.points))
+        ox, oy = other
+        return ListVectorArray((x - ox, y - oy) for x, y in self.points)
+
+    def __mul__(self, scale):
+        """Scale every vector.
+
+        :Parameters:
+            `scale` : float
+                The factor by which to scale.
+
+        """
+        return ListVectorArray((x * scale, y * scale) for x, y in self.points)
+
+    __rmul__ = __mul__
+
+    def rotated(self, angle):
+        """Rotate every vector about the origin.
+
+        :Parameters:
+            `angle` : float
+                The angle (in degrees) by which to rotate.
+
+        """
+        angle = math.radians(angle)
+        ca, sa = math.cos(angle), math.sin(angle)
+        return ListVectorArray((x * ca - y * sa, x * sa + y * ca) for x, y in self.points)
+
+    def reflected_x(self):
+        """Reflect every vector in the y axis, negating the x coordinates.
+
+        """
+        return ListVectorArray((-x, y) for x, y in self.points)
+
+    def reflected_y(self):
+        """Reflect every vector in the x axis, negating the y coordinates.
+
+        """
+        return ListVectorArray((x, -y) for x, y in self.points)
+
+    def bounds(self, radii=None):
+        """Compute the lower left and upper right corners of the bounding box.
+
+        :Parameters:
+            `radii` : sequence of float
+                If given, bound circles of these radii centred on the vectors.
+
+        """
+        if radii is None:
+            radii = [0] * len(self.points)
+        pts = list(zip(self.points, radii))
+        lx = min(x - r for (x, y), r in pts)
+        ly = min(y - r for (x, y), r in pts)
+        hx = max(x + r for (x, y), r in pts)
+        hy = max(y + r for (x, y), r in pts)
+        return Vector((lx, ly)), Vector((hx, hy))
+
+    def distance_matrix(self, other=None):
+        """Compute the distance between every pair of vectors.
+
+        Returns a nested sequence m such that m[i][j] is the distance from
+        self[i] to other[j].
+
+        :Parameters:
+            `other` : VectorArray
+                The vectors to measure the distance to; defaults to this array.
+
+        """
+        if other is None:
+            other = self
+        sqrt = math.sqrt
+        return [
+            [sqrt((x - ox) * (x - ox) + (y - oy) * (y - oy)) for ox, oy in other.points]
+            for x, y in self.points
+        ]
+
+
+class NumpyVectorArray(object):
+    """An array of two-dimensional vectors that are transformed together.
+
+    This is the implementation backed by a NumPy array. Use VectorArray, which
+    is the best implementation available.
+
+    """
+
+    def __init__(self, points):
+        """Create a VectorArray.
+
+        :Parameters:
+            `points` : iterable of Vector, or NumPy array of shape (n, 2)
+                The vectors in the array.
+
+        """
+        if isinstance(points, numpy.ndarray):
+            self.points = points
+        else:
+            self.points = numpy.array([tuple(p) for p in points], dtype=float).reshape(-1, 2)
+
+    def __repr__(self):
+        """Construct a precise string representation.
+
+        """
+        return "VectorArray(%r)" % ([tuple(p) for p in self.points.tolist()],)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __iter__(self):
+        """Iterate over the vectors in the array.
+
+        """
+        for p in self.points.tolist():
+            yield Vector(p)
+
+    def __getitem__(self, i):
+        return Vector(self.points[i].tolist())
+
+    def tolist(self):
+        """Return the vectors in the array as a list.
+
+        """
+        return [Vector(p) for p in self.points.tolist()]
+
+    def __add__(self, other):
+        """Translate every vector by a vector, or add two arrays elementwise.
+
+        :Parameters:
+            `other` : Vector or VectorArray
+                The object to add.
+
+        """
+        if isinstance(other, NumpyVectorArray):
+            other = other.points
+        return NumpyVectorArray(self.points + other)
+
+    def __sub__(self, other):
+        """Translate every vector by the negation of a vector, or subtract two
+        arrays elementwise.
+
+        :Parameters:
+            `other` : Vector or VectorArray
+                The object to subtract.
+
+        """
+        if isinstance(other, NumpyVectorArray):
+            other = other.points
+        return NumpyVectorArray(self.points - other)
+
+    def __mul__(self, scale):
+        """Scale every vector.
+
+        :Parameters:
+            `scale` : float
+                The factor by which to scale.
+
+        """
+        return NumpyVectorArray(self.points * scale)
+
+    __rmul__ = __mul__
+
+    def rotated(self, angle):
+        """Rotate every vector about the origin.
+
+        :Parameters:
+            `angle` : float
+                The angle (in degrees) by which to rotate.
+
+        """
+        angle = math.radians(angle)
+        ca, sa = math.cos(angle), math.sin(angle)
+        return NumpyVectorArray(self.points.dot(numpy.array([[ca, sa], [-sa, ca]])))
+
+    def reflected_x(self):
+        """Reflect every vector in the y axis, negating the x coordinates.
+
+        """
+        return NumpyVectorArray(self.points * (-1.0, 1.0))
+
+    def reflected_y(self):
+        """Reflect every vector in the x axis, negating the y coordinates.
+
+        """
+        return NumpyVectorArray(self.points * (1.0, -1.0))
+
+    def bounds(self, radii=None):
+        """Compute the lower left and upper right corners of the bounding box.
+
+        :Parameters:
+            `radii` : sequence of float
+                If given, bound circles of these radii centred on the vectors.
+
+        """
+        if radii is None:
+            lo = self.points.min(axis=0)
+            hi = self.points.max(axis=0)
+        else:
+            r = numpy.asarray(radii, dtype=float).reshape(-1, 1)
+            lo = (self.points - r).min(axis=0)
+            hi = (self.points + r).max(axis=0)
+        return Vector(lo.tolist()), Vector(hi.tolist())
+
+    def distance_matrix(self, other=None):
+        """Compute the distance between every pair of vectors.
+
+        Returns a nested sequence m such that m[i][j] is the distance from
+        self[i] to other[j].
+
+        :Parameters:
+            `other` : VectorArray
+                The vectors to measure the distance to; defaults to this array.
+
+        """
+        if other is None:
+            other = self
+        d = self.points[:, numpy.newaxis, :] - other.points[numpy.newaxis, :, :]
+        return numpy.sqrt((d * d).sum(axis=2))
+
+
+#: Arrays of fewer vectors than this are kept in pure Python even if NumPy is
+#: available, as the overhead of each NumPy call outweighs its speed on a
+#: handful of points. Measure with ``tools/vector_benchmark.py --arrays``.
+NUMPY_THRESHOLD = 32
+
+
+def VectorArray(points):
+    """Create an array of vectors, using the best implementation for its size.
+
+    :Parameters:
+        `points` : iterable of Vector, or NumPy array of shape (n, 2)
+            The vectors in the array.
+
+    """
+    if numpy is None:
+        return ListVectorArray(points)
+    if isinstance(points, numpy.ndarray):
+        return NumpyVectorArray(points)
+    points = list(points)
+    if len(points) < NUMPY_THRESHOLD:
+        return ListVectorArray(points)
+    return NumpyVectorArray(points)
+
+
 def v(*args):
     """Construct a vector from an iterable or from multiple arguments. Valid
     forms are therefore: ``v((x, y))`` and ``v(x, y)``.
@@ -1,51 +1,266 @@
+import zlib
+import random
+import struct
+
 from .vector import v
+from .geom import Bounds
+from .spatial import SpatialHash
+from .timers import Scheduler
 from .physics import get_physics
+from .snapshot import Snapshot
 
 from .digits import DamageActor
 
 class World(object):
-    def __init__(self):
+    """A self-contained fight.
+
+    Each world has its own physics world, random number generator and timers,
+    so any number of them can be run side by side. If step is given, physics
+    is advanced in fixed steps of that length (see AbstractPhysics.create_world).
+
+    """
+    def __init__(self, seed=None, step=None):
+        self.random = random.Random(seed)
+        self.timers = Scheduler()
         self.actors = []
         self.monsters = []
+        # Monsters by team name, and the cached enemies of each team
+        self.teams = {}
+        self._enemies = {}
+        # (part, attacker name, amount) for damage dealt this tick
+        self.damage_events = []
+        # While actors are being updated, destroyed actors are left in
+        # self.actors and counted here, to be removed once the pass is over
+        self._updating = False
+        self._destroyed = 0
+        self._bounds_acc = Bounds()
+        # Number of times the world has been stepped, and the time elapsed
+        self.tick = 0
+        self.time = 0
+        # Number of AIControllers created, used to stagger their decisions
+        self.ai_count = 0
+        # The x coordinate, in the coordinates the match started in, of the
+        # current origin; see recenter()
+        self.origin = 0
+        # Timer callbacks fired by the last update(), in order
+        self.fired = []
+        # Incremented whenever bodies, monsters or joints are added or
+        # removed; see snapshot.Structure
+        self.structure_version = 0
+        self._structure = None
+        self._pick_index = SpatialHash(self.PICK_CELL_SIZE)
+        self._pick_key = None
         physics = get_physics()
-        self.world = physics.create_world(gravity=v(0, -500))
+        self.world = physics.create_world(gravity=v(0, -500), step=step)
         self.world.create_ground(40)
 
     def add_monster(self, monster):
         self.monsters.append(monster)
+        self.structure_version += 1
+        self.teams[monster.name] = self.teams.get(monster.name, ()) + (monster,)
+        self._enemies = {}
 
     def remove_monster(self, monster):
         self.monsters.remove(monster)
+        self.structure_version += 1
+        team = tuple(m for m in self.teams[monster.name] if m is not monster)
+        if team:
+            self.teams[monster.name] = team
+        else:
+            del self.teams[monster.name]
+        self._enemies = {}
+
+    PICK_CELL_SIZE = 64
+
+    def pick_index(self):
+        """Return a SpatialHash of (part, x, y, radius) for every monster circle.
+
+        The index is built from the monsters' part hierarchies, and rebuilt
+        only when one of them has been refitted.
 
-    def get_monster_bounds(self):
-        bounds = None
+        """
         for m in self.monsters:
-            if bounds is None:
-                bounds = m.get_bounds()
-            else:
-                bounds = bounds.union(m.get_bounds())
-        return bounds
+            m.tree.refit()
+        key = [(m, m.tree.version) for m in self.monsters]
+        if key != self._pick_key:
+            index = self._pick_index
+            index.clear()
+            for m in self.monsters:
+                for node in m.tree.nodes:
+                    for x, y, r, p in node.circles:
+                        index.insert(x, y, r, (node.part, x, y, r))
+            self._pick_key = key
+        return self._pick_index
 
-    def get_player(self):
+    def part_at(self, point):
+        """Return the monster part at point, or None."""
+        px, py = point
+        for part, x, y, r in self.pick_index().query(px, py):
+            dx = px - x
+            dy = py - y
+            if dx * dx + dy * dy < r * r:
+                return part
+        return None
+
+    def get_monster_bounds(self, focus=None, radius=None):
+        """Return the bounds of the monsters.
+
+        If focus is given, only monsters within radius of the focus monster
+        are included, along with the focus monster itself.
+
+        """
+        monsters = self.monsters
+        if focus is not None and not focus.dead:
+            fx = focus.get_position().x
+            monsters = [
+                m for m in monsters
+                if m is focus or abs(m.get_position().x - fx) < radius
+            ]
+        acc = self._bounds_acc
+        acc.clear()
+        for m in monsters:
+            bounds = m.get_bounds()
+            if bounds is not None:
+                acc.add_rect(bounds)
+        return acc.rect()
+
+    # Recentre the world once the monsters are this far from the origin
+    RECENTER_DISTANCE = 1000
+
+    def recenter(self):
+        """Shift everything back towards x = 0 if the monsters have wandered.
+
+        This keeps the fight inside the physics engine's fixed world bounds,
+        and its coordinates small, however far the monsters walk. Returns the
+        distance everything was moved by.
+
+        """
+        # Centred on the parts' bodies, which are up to date even in a world
+        # that is never drawn
+        xs = [p.get_position().x for m in self.monsters for p in m.parts]
+        if not xs:
+            return 0
+        cx = (min(xs) + max(xs)) * 0.5
+        if abs(cx) < self.RECENTER_DISTANCE:
+            return 0
+        offset = -int(cx)
+        self.world.shift_origin(v(offset, 0))
+        for a in self.actors:
+            if a.body is None:
+                a.translate(v(offset, 0))
         for m in self.monsters:
-            if m.name == 'player':
-                return m
+            m.invalidate_geometry()
+        self.origin -= offset
+        return offset
+
+    def get_player(self):
+        team = self.teams.get('player')
+        if team:
+            return team[0]
 
     def get_enemies(self):
-        return [m for m in self.monsters if m.name != 'player']
+        return self.get_enemies_for_name('player')
 
     def get_friends_for_name(self, name):
-        return [m for m in self.monsters if m.name == name]
+        """Return a tuple of the monsters on the team called name."""
+        return self.teams.get(name, ())
 
     def get_enemies_for_name(self, name):
-        return [m for m in self.monsters if m.name != name]
+        """Return a tuple of the monsters not on the team called name."""
+        try:
+            return self._enemies[name]
+        except KeyError:
+            enemies = self._enemies[name] = tuple(m for m in self.monsters if m.name != name)
+            return enemies
+
+    def get_stats(self):
+        """Return a dict of statistics about the world, for profiling."""
+        return {
+            'monsters': len(self.monsters),
+            'actors': len(self.actors),
+            'sleeping': self.world.get_sleeping_fraction(),
+        }
+
+    def snapshot(self):
+        """Return a Snapshot of the complete state of the world."""
+        return Snapshot(self)
+
+    def restore(self, snapshot):
+        """Return the world to the state it was in when snapshot was taken.
+
+        Monsters and parts created since the snapshot are destroyed, and those
+        destroyed since are recreated, as new objects. The physics engine's
+        internal state is reset, so the world only carries on exactly as it
+        did after the snapshot if it was canonicalized when it was taken.
+
+        """
+        snapshot.restore(self)
+
+    def canonicalize(self):
+        """Put the world into the state restoring a snapshot of it would give.
+
+        This discards the state the physics engine keeps internally (see
+        snapshot), so that snapshots taken straight afterwards restore
+        exactly.
+
+        """
+        self.restore(self.snapshot())
+
+    def checksum(self):
+        """Return a CRC of the state of all monsters.
+
+        Values are rounded to single precision, which is plenty to detect a
+        simulation diverging but keeps the checksum cheap to compute.
+
+        """
+        values = []
+        for m in self.monsters:
+            values.append(m.mutagen)
+            for p in m.parts:
+                x, y = p.get_position()
+                values.extend((x, y, p.body.get_rotation(), p.health))
+        data = struct.pack('<%df' % len(values), *values)
+        return zlib.crc32(data) & 0xffffffff
 
     def update(self, dt):
+        self.timers.advance(dt)
+        self.fired = []
+        for callback in self.timers.due():
+            self.fired.append(callback)
+            callback()
         for m in self.monsters:
             m.update(dt)
-        for a in self.actors:
-            a.update(dt)
+        self.update_actors(dt)
+        self.resolve_damage()
+        for m in self.monsters:
+            m.resolve_healing()
         self.world.update(dt)
+        self.recenter()
+        self.tick += 1
+        self.time += dt
+
+    def update_actors(self, dt):
+        """Update every actor, including those spawned while doing so.
+
+        The actor list is never rebuilt during the pass: actors spawned are
+        appended and updated in the same pass, and actors destroyed are
+        skipped, then removed from the list once the pass is over.
+
+        """
+        actors = self.actors
+        self._updating = True
+        try:
+            i = 0
+            while i < len(actors):
+                a = actors[i]
+                i += 1
+                if a.world is self:
+                    a.update(dt)
+        finally:
+            self._updating = False
+        if self._destroyed:
+            self.actors = [a for a in actors if a.world is self]
+            self._destroyed = 0
 
     def draw(self):
         for a in self.actors:
@@ -60,19 +275,105 @@ class World(object):
             pass
         else:
             create_body(self.world)
+            self.structure_version += 1
+
+    def spawn_many(self, actors):
+        """Spawn several actors at once.
+
+        The physics bodies of the actors are created in a single batch.
+
+        """
+        batch = []
+        for actor in actors:
+            actor.world = self
+            if getattr(actor, 'BATCH_BODY', False):
+                batch.append(actor)
+            else:
+                try:
+                    create_body = actor.create_body
+                except AttributeError:
+                    pass
+                else:
+                    create_body(self.world)
+        bodies = self.world.create_bodies([a.get_body_def() for a in batch])
+        for actor, body in zip(batch, bodies):
+            actor.set_body(body)
+        self.actors.extend(actors)
+        self.structure_version += 1
 
     def damage_part(self, part, attacker_name, damage_amount):
-        part.health -= damage_amount
-        self.spawn(DamageActor(part.get_position(), int(damage_amount + 0.5)))
-        if part.health <= 0:
-            part.kill()
+        """Queue damage to part, to be dealt by resolve_damage()."""
+        self.damage_events.append((part, attacker_name, damage_amount))
+
+    def resolve_damage(self):
+        """Deal the damage queued this tick.
+
+        Damage is totalled per part, with one damage number per part, and
+        the mutagen for it is credited once per attacking team. Parts are
+        killed in the order they were first hit.
+
+        """
+        events = self.damage_events
+        if not events:
+            return
+        self.damage_events = []
+
+        totals = {}
+        order = []
+        credit = {}
+        for part, attacker_name, amount in events:
+            if part not in totals:
+                totals[part] = 0
+                order.append(part)
+            totals[part] += amount
+            credit[attacker_name] = credit.get(attacker_name, 0) + amount
 
-        friends = self.get_friends_for_name(attacker_name)
-        for f in friends:
-            f.add_mutagen(damage_amount * 1.5 / len(friends))
+        dead = []
+        for part in order:
+            if part.world is not self:
+                continue
+            amount = totals[part]
+            part.health -= amount
+            self.spawn(DamageActor(part.get_position(), int(amount + 0.5)))
+            if part.health <= 0:
+                dead.append(part)
+        for part in dead:
+            # parts may already have died along with the part they hang off
+            if part.world is self:
+                part.kill()
+
+        for name in sorted(credit):
+            friends = self.get_friends_for_name(name)
+            for f in friends:
+                f.add_mutagen(credit[name] * 1.5 / len(friends))
 
     def destroy(self, actor):
-        self.actors.remove(actor)
+        if self._updating:
+            self._destroyed += 1
+        else:
+            self.actors.remove(actor)
         actor.world = None
         if actor.body:
             actor.body.destroy()
+            self.structure_version += 1
+
+    def destroy_many(self, actors):
+        """Destroy several actors at once.
+
+        The actor list is rebuilt once, or after the actors have all been
+        updated if this is called during update_actors(), and the physics
+        bodies are destroyed in a single batch.
+
+        """
+        if self._updating:
+            self._destroyed += len(actors)
+        else:
+            doomed = set(actors)
+            self.actors = [a for a in self.actors if a not in doomed]
+        bodies = []
+        for actor in actors:
+            actor.world = None
+            if actor.body:
+                bodies.append(actor.body)
+        self.world.destroy_bodies(bodies)
+        self.structure_version += 1
@@ -0,0 +1,122 @@
+import math
+import random
+import unittest
+
+from monstermechanics.hierarchy import PartTree, enclose
+
+
+class FakeWorld(object):
+    tick = 0
+
+
+class FakePart(object):
+    """A part with a single circle, attached like a monster's parts."""
+    def __init__(self, x, y, r):
+        self.x = x
+        self.y = y
+        self.r = r
+        self._parent = None
+        self._joints = []
+
+    def attach(self, child):
+        self._joints.append((child, None))
+        child._parent = self
+
+    def subparts(self):
+        return [self]
+
+    def get_position(self):
+        return self.x, self.y
+
+    def get_shapes(self):
+        return [((0, 0), self.r)]
+
+
+class FakeMonster(object):
+    def __init__(self, parts):
+        self.world = FakeWorld()
+        self.parts = parts
+
+
+def random_monster(rng, count):
+    parts = [FakePart(0, 0, 20)]
+    for i in range(count - 1):
+        parent = rng.choice(parts)
+        angle = rng.uniform(0, 2 * math.pi)
+        part = FakePart(parent.x + 30 * math.cos(angle), parent.y + 30 * math.sin(angle),
+                        rng.uniform(5, 25))
+        parent.attach(part)
+        parts.append(part)
+    rng.shuffle(parts)
+    return FakeMonster(parts)
+
+
+class EncloseTest(unittest.TestCase):
+    def test_encloses_both(self):
+        rng = random.Random(2)
+        for i in range(500):
+            a = rng.uniform(-50, 50), rng.uniform(-50, 50), rng.uniform(0, 30)
+            b = rng.uniform(-50, 50), rng.uniform(-50, 50), rng.uniform(0, 30)
+            x, y, r = enclose(a, b)
+            for cx, cy, cr in a, b:
+                self.assertLessEqual(math.hypot(cx - x, cy - y) + cr, r + 1e-9)
+
+    def test_contained_circle(self):
+        self.assertEqual(enclose((0, 0, 10), (1, 1, 2)), (0, 0, 10))
+        self.assertEqual(enclose((1, 1, 2), (0, 0, 10)), (0, 0, 10))
+
+
+class PartTreeTest(unittest.TestCase):
+    def query(self, tree, x, y, radius):
+        return set(node.part for node in tree.candidates(x, y, radius))
+
+    def test_candidates_include_every_nearby_part(self):
+        rng = random.Random(3)
+        monster = random_monster(rng, 40)
+        tree = PartTree(monster)
+        for i in range(300):
+            x, y, radius = rng.uniform(-250, 250), rng.uniform(-250, 250), rng.uniform(0, 40)
+            found = self.query(tree, x, y, radius)
+            for p in monster.parts:
+                if math.hypot(p.x - x, p.y - y) < p.r + radius:
+                    self.assertIn(p, found)
+            for p in found:
+                self.assertLess(math.hypot(p.x - x, p.y - y), p.r + radius + 1e-6)
+
+    def test_every_part_is_a_node(self):
+        monster = random_monster(random.Random(4), 25)
+        tree = PartTree(monster)
+        tree.refit()
+        self.assertEqual(set(n.part for n in tree.nodes), set(monster.parts))
+        self.assertEqual(len(tree.roots), 1)
+
+    def test_detached_parts_become_roots(self):
+        a, b, c = FakePart(0, 0, 5), FakePart(10, 0, 5), FakePart(100, 0, 5)
+        a.attach(b)
+        tree = PartTree(FakeMonster([b, c, a]))
+        tree.refit()
+        self.assertEqual(set(n.part for n in tree.roots), set([a, c]))
+        self.assertEqual(self.query(tree, 100, 0, 1), set([c]))
+
+    def test_refits_once_per_tick(self):
+        a = FakePart(0, 0, 5)
+        monster = FakeMonster([a])
+        tree = PartTree(monster)
+        self.assertEqual(self.query(tree, 0, 0, 1), set([a]))
+        version = tree.version
+
+        a.x = 100
+        self.assertEqual(self.query(tree, 100, 0, 1), set())
+        self.assertEqual(tree.version, version)
+
+        monster.world.tick += 1
+        self.assertEqual(self.query(tree, 100, 0, 1), set([a]))
+        self.assertEqual(tree.version, version + 1)
+
+        a.x = 200
+        tree.invalidate()
+        self.assertEqual(self.query(tree, 200, 0, 1), set([a]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+import io
+import random
+import unittest
+
+from monstermechanics import replay
+from monstermechanics.replay import Recorder, ReplayReader, pack_controls, unpack_controls
+
+
+class FakeWorld(object):
+    def __init__(self):
+        self.tick = 0
+
+    def checksum(self):
+        return (self.tick * 2654435761) & 0xffffffff
+
+
+def record(recorder, ticks, seed=0):
+    """Record a random match of the given length, returning what was recorded."""
+    rng = random.Random(seed)
+    world = FakeWorld()
+    expected = []
+    controls = [False] * 8
+    dt = 1 / 60.0
+    for tick in range(ticks):
+        if rng.random() < 0.1:
+            controls[rng.randrange(8)] ^= True
+        if rng.random() < 0.05:
+            dt = rng.choice([1 / 60.0, 1 / 30.0, 0.0171])
+        events = []
+        inputs = []
+        if rng.random() < 0.02:
+            events.append(rng.choice([u'spawn_next_enemy', u'clear_message']))
+        if rng.random() < 0.01:
+            inputs.append((u'attach', u'{"cost": 125, "part": "h\xe9art"}'))
+            inputs.append((u'design', u'x' * 1000))
+
+        world.tick = tick
+        recorder.begin_tick(tick, controls, dt)
+        for e in events:
+            recorder.record_event(e)
+        for kind, data in inputs:
+            recorder.record_input(kind, data)
+        recorder.end_tick(world)
+        checksum = world.checksum() if tick % recorder.checksum_interval == 0 else None
+        expected.append(replay.TickRecord(tick, pack_controls(controls), dt, checksum, events, inputs))
+    return expected
+
+
+class ReplayTest(unittest.TestCase):
+    def assertRecordsEqual(self, records, expected):
+        self.assertEqual(len(records), len(expected))
+        for r, e in zip(records, expected):
+            self.assertEqual(r.tick, e.tick)
+            self.assertEqual(r.controls, e.controls)
+            self.assertEqual(r.dt, e.dt)
+            self.assertEqual(r.checksum, e.checksum)
+            self.assertEqual(list(r.events), e.events)
+            self.assertEqual(list(r.inputs), e.inputs)
+
+    def test_round_trip_in_memory(self):
+        recorder = Recorder(1234, u'enemy1.json', checksum_interval=7, keyframe_interval=50)
+        expected = record(recorder, 2000)
+        reader = ReplayReader(recorder.getvalue())
+        self.assertEqual(reader.seed, 1234)
+        self.assertEqual(reader.filename, u'enemy1.json')
+        self.assertEqual(reader.checksum_interval, 7)
+        self.assertEqual(reader.keyframe_interval, 50)
+        self.assertRecordsEqual(list(reader), expected)
+
+    def test_round_trip_to_file(self):
+        out = io.BytesIO()
+        recorder = Recorder(99, out=out)
+        expected = record(recorder, 1500, seed=1)
+        recorder.flush()
+        reader = ReplayReader(out.getvalue())
+        self.assertEqual(reader.filename, None)
+        self.assertRecordsEqual(list(reader), expected)
+
+    def test_chunks_decode_independently(self):
+        recorder = Recorder(0)
+        expected = record(recorder, replay.CHUNK_TICKS * 3 + 10, seed=2)
+        reader = ReplayReader(recorder.getvalue())
+        chunks = list(reader.chunks())
+        self.assertEqual([tick for tick, pos, end in chunks],
+                         [i * replay.CHUNK_TICKS for i in range(4)])
+
+        # Dropping the first chunk leaves a recording that starts later
+        first_end = chunks[1][1] - replay.CHUNK_HEADER.size - 5
+        data = reader.data[:reader.start] + reader.data[first_end:]
+        self.assertRecordsEqual(list(ReplayReader(data)), expected[replay.CHUNK_TICKS:])
+
+    def test_memory_is_bounded(self):
+        max_chunks = replay.MAX_CHUNKS
+        replay.MAX_CHUNKS = 2
+        try:
+            recorder = Recorder(0)
+        finally:
+            replay.MAX_CHUNKS = max_chunks
+        expected = record(recorder, replay.CHUNK_TICKS * 4 + 1, seed=3)
+        records = list(ReplayReader(recorder.getvalue()))
+        # The unfinished chunk is flushed, so the last two chunks are the
+        # last full one and the single tick after it
+        self.assertRecordsEqual(records, expected[replay.CHUNK_TICKS * 3:])
+
+    def test_long_strings_and_many_events(self):
+        filename = u'data/' + u'd' * 300 + u'.json'
+        recorder = Recorder(5, filename)
+        world = FakeWorld()
+        events = [u'event%d' % i for i in range(300)]
+        inputs = [(u'attach', u'{}')] * 300
+        recorder.begin_tick(0, [False], 0.5)
+        for e in events:
+            recorder.record_event(e)
+        for kind, data in inputs:
+            recorder.record_input(kind, data)
+        recorder.end_tick(world)
+        reader = ReplayReader(recorder.getvalue())
+        self.assertEqual(reader.filename, filename)
+        self.assertRecordsEqual(list(reader), [replay.TickRecord(0, 0, 0.5, world.checksum(), events, inputs)])
+
+    def test_steady_tick_costs_one_byte(self):
+        recorder = Recorder(0, checksum_interval=1000)
+        world = FakeWorld()
+        for tick in range(1, 101):
+            recorder.begin_tick(tick, [False], 0.5)
+            recorder.end_tick(world)
+        # The first tick writes controls and dt in full
+        self.assertEqual(len(recorder.chunk), replay.CHUNK_HEADER.size + 100 +
+                         replay.CONTROLS.size + replay.DT.size)
+
+    def test_rejects_other_data(self):
+        self.assertRaises(ValueError, ReplayReader, b'XXXX' + b'\0' * 20)
+        data = bytearray(Recorder(0).getvalue())
+        data[4] = replay.VERSION + 1
+        self.assertRaises(ValueError, ReplayReader, bytes(data))
+
+    def test_controls(self):
+        state = [True, False, False, True, True]
+        self.assertEqual(unpack_controls(pack_controls(state), len(state)), state)
+        self.assertEqual(pack_controls([]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,301 @@
+import random
+import unittest
+import zlib
+
+from monstermechanics import session
+from monstermechanics.controls import Control
+from monstermechanics.session import Session, TEAMS, MAX_ROLLBACK, ROLLBACK_INTERVAL, rollback_point
+
+LEFT = 1 << Control.MoveLeft
+RIGHT = 1 << Control.MoveRight
+ATTACK = 1 << Control.Attack
+
+
+class FakePart(object):
+    def __init__(self, health, scale=0.5):
+        self.health = health
+        self.scale = scale
+
+
+class FakeMonster(object):
+    def __init__(self, x, parts):
+        self.x = x
+        self.parts = parts
+        self.move = 0
+        self.attacking = False
+
+    def left(self):
+        self.move = -1
+
+    def right(self):
+        self.move = 1
+
+    def attack(self):
+        self.attacking = True
+
+
+class FakeWorld(object):
+    """A match between two monsters, with randomness and state like Box2D's.
+
+    Like a World, the monsters lose parts as they are hurt, and snapshots are
+    restored by writing values back when nothing has been created or destroyed
+    since, or by rebuilding the monsters from scratch otherwise. momentum
+    stands in for the state the physics engine keeps internally: it affects
+    how the monsters move, but snapshots do not capture it.
+
+    """
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.teams = {
+            'player': [FakeMonster(0, [FakePart(6) for i in range(3)])],
+            'enemy': [FakeMonster(100, [FakePart(6) for i in range(3)])],
+        }
+        self.momentum = 0
+        self.structure_version = 0
+        self.rebuilds = 0
+
+    def update(self, dt):
+        for team, other in zip(TEAMS, reversed(TEAMS)):
+            for m in self.teams.get(team, ()):
+                m.x += m.move * (1 + self.momentum) * len(m.parts) + self.random.random()
+                for p in m.parts:
+                    p.scale = min(p.scale + 0.01 * self.momentum, 1.5)
+                if m.attacking:
+                    for o in self.teams.get(other, ()):
+                        o.parts[-1].health -= 1
+                m.move = 0
+                m.attacking = False
+        self.momentum = (self.momentum + 1) % 3
+        for team in list(self.teams):
+            for m in self.teams[team]:
+                parts = [p for p in m.parts if p.health > 0]
+                if len(parts) != len(m.parts):
+                    m.parts = parts
+                    self.structure_version += 1
+            self.teams[team] = [m for m in self.teams[team] if m.parts]
+            if not self.teams[team]:
+                del self.teams[team]
+
+    def snapshot(self):
+        structure = self.structure_version, [(team, m, list(m.parts)) for team, ms in sorted(self.teams.items()) for m in ms]
+        values = [(m.x, [(p.health, p.scale) for p in parts]) for team, m, parts in structure[1]]
+        return structure, values
+
+    def restore(self, snapshot):
+        (version, objects), values = snapshot
+        if version != self.structure_version:
+            self.rebuilds += 1
+            self.structure_version += 1
+            objects = [(team, FakeMonster(0, []), [FakePart(0) for p in parts]) for team, m, parts in objects]
+            self.teams = {}
+            for team, m, parts in objects:
+                m.parts = list(parts)
+                self.teams.setdefault(team, []).append(m)
+        for (team, m, parts), (x, states) in zip(objects, values):
+            m.x = x
+            for p, (health, scale) in zip(parts, states):
+                p.health = health
+                p.scale = scale
+        self.momentum = 0
+
+    def canonicalize(self):
+        self.restore(self.snapshot())
+
+    def checksum(self):
+        return zlib.crc32(repr(self.snapshot()[1]).encode('ascii')) & 0xffffffff
+
+
+class Link(object):
+    """One direction of an in-memory connection, which can delay and drop packets."""
+    def __init__(self, delay=0, loss=0, seed=0):
+        self.delay = delay
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.time = 0
+        self.queue = []
+
+    def send(self, data):
+        if self.random.random() >= self.loss:
+            self.queue.append((self.time + self.delay, data))
+
+    def deliver(self):
+        due = [data for when, data in self.queue if when <= self.time]
+        self.queue = [(when, data) for when, data in self.queue if when > self.time]
+        return due
+
+
+class Endpoint(object):
+    def __init__(self, outgoing, incoming):
+        self.outgoing = outgoing
+        self.incoming = incoming
+
+    def send(self, data):
+        self.outgoing.send(data)
+
+    def receive(self):
+        return self.incoming.deliver()
+
+
+def connect(seed=7, **kwargs):
+    """Return the sessions of both sides of a match."""
+    there = Link(seed=1, **kwargs)
+    back = Link(seed=2, **kwargs)
+    a = Session(FakeWorld(), seed, 0, Endpoint(there, back))
+    b = Session(FakeWorld(), seed, 1, Endpoint(back, there))
+    return a, b, (there, back)
+
+
+def play(a, b, links, inputs, frames):
+    """Advance both sessions once per frame, returning the inputs each simulated by tick."""
+    played = ({}, {})
+    for frame in range(frames):
+        for link in links:
+            link.time += 1
+        for s, log in zip((a, b), played):
+            bits = inputs(s.side, s.tick)
+            if s.advance(bits):
+                log[s.tick - 1] = bits
+    return played
+
+
+def settle(a, b, links):
+    for i in range(MAX_ROLLBACK * 4):
+        for link in links:
+            link.time += 1000
+        a.advance(0)
+        b.advance(0)
+    for i in range(3):
+        for link in links:
+            link.time += 1000
+        a.poll()
+        b.poll()
+
+
+def reference(seed, played, ticks):
+    """Return the checksums of a match simulated with every input known."""
+    s = Session(FakeWorld(), seed, 0, None)
+    s.local_inputs = dict(played[0])
+    s.remote_inputs = dict(played[1])
+    s.confirmed = ticks
+    for t in range(ticks):
+        s.simulate(t)
+    return s.checksums
+
+
+def varied_inputs(side, tick):
+    return (0, LEFT, RIGHT, ATTACK, RIGHT | ATTACK)[(tick // (5 + 4 * side) + side) % 5]
+
+
+class SessionTest(unittest.TestCase):
+    def test_rollback_point(self):
+        self.assertEqual(rollback_point(0), 0)
+        self.assertEqual(rollback_point(ROLLBACK_INTERVAL - 1), 0)
+        self.assertEqual(rollback_point(ROLLBACK_INTERVAL * 3 + 1), ROLLBACK_INTERVAL * 3)
+
+    def test_prediction_repeats_last_confirmed_input(self):
+        a, b, links = connect()
+        a.remote_inputs = {0: LEFT, 1: RIGHT}
+        a.confirmed = 1
+        self.assertEqual(a.remote_input(1), RIGHT)
+        self.assertEqual(a.remote_input(5), RIGHT)
+
+    def test_waits_for_remote_inputs(self):
+        a, b, links = connect()
+        for i in range(MAX_ROLLBACK):
+            self.assertTrue(a.advance(0))
+        self.assertFalse(a.advance(0))
+        self.assertEqual(a.tick, MAX_ROLLBACK)
+        # The inputs are still sent while waiting
+        self.assertEqual(len(links[0].queue), MAX_ROLLBACK + 1)
+
+    def test_copies_agree_with_delay(self):
+        a, b, links = connect(delay=3)
+        played = play(a, b, links, varied_inputs, 300)
+        settle(a, b, links)
+        self.assertGreater(a.rollbacks + b.rollbacks, 0)
+        self.assertEqual(a.desyncs, [])
+        self.assertEqual(b.desyncs, [])
+        settled = a.get_settled()
+        self.assertEqual(settled, b.get_settled())
+        self.assertEqual(a.checksums[settled], b.checksums[settled])
+
+    def test_rollback_is_exact(self):
+        """Both copies match a world that never had to roll back."""
+        session.CHECKSUM_HISTORY, history = 10000, session.CHECKSUM_HISTORY
+        try:
+            a, b, links = connect(delay=4, loss=0.3)
+            played = play(a, b, links, varied_inputs, 400)
+            settle(a, b, links)
+        finally:
+            session.CHECKSUM_HISTORY = history
+        played[0].update((t, 0) for t in range(a.tick) if t not in played[0])
+        played[1].update((t, 0) for t in range(b.tick) if t not in played[1])
+        settled = a.get_settled()
+        expected = reference(7, played, settled + 1)
+        self.assertGreater(a.rollbacks, 0)
+        self.assertGreater(b.rollbacks, 0)
+        for t in range(settled + 1):
+            self.assertEqual(a.checksums[t], expected[t], t)
+            self.assertEqual(b.checksums[t], expected[t], t)
+
+    def test_forgets_what_cannot_be_rolled_back(self):
+        a, b, links = connect(delay=2)
+        play(a, b, links, varied_inputs, 200)
+        settled = a.get_settled()
+        start = rollback_point(settled + 1)
+        self.assertEqual(min(a.snapshots), start)
+        self.assertTrue(all(t % ROLLBACK_INTERVAL == 0 for t in a.snapshots))
+        self.assertGreaterEqual(min(a.predicted), settled + 1)
+        self.assertLessEqual(min(a.local_inputs), a.acked + 1)
+        self.assertLessEqual(min(a.remote_inputs), settled)
+
+    def test_rollback_across_structure_change_is_exact(self):
+        """Rolling back to before a part died rebuilds the monsters exactly."""
+        def inputs(side, tick):
+            # Side 1 attacks in bursts, which side 0 keeps mispredicting
+            if side == 1:
+                return ATTACK if tick % 12 < 3 else 0
+            return varied_inputs(side, tick)
+        a, b, links = connect(delay=5)
+        played = play(a, b, links, inputs, 200)
+        settle(a, b, links)
+        self.assertGreater(a.world.rebuilds, 0)
+        self.assertLess(len(a.world.teams['player'][0].parts), 3)
+        played[0].update((t, 0) for t in range(a.tick) if t not in played[0])
+        played[1].update((t, 0) for t in range(b.tick) if t not in played[1])
+        settled = a.get_settled()
+        expected = reference(7, played, settled + 1)
+        for t in range(max(0, settled - session.CHECKSUM_HISTORY), settled + 1):
+            self.assertEqual(a.checksums[t], expected[t], t)
+            self.assertEqual(b.checksums[t], expected[t], t)
+        self.assertEqual(a.desyncs, [])
+        self.assertEqual(b.desyncs, [])
+
+    def test_detects_desync(self):
+        def moves(side, tick):
+            return varied_inputs(side, tick) & ~ATTACK
+        a, b, links = connect()
+        play(a, b, links, moves, 50)
+        b.world.teams['player'][0].x += 1
+        play(a, b, links, moves, 50)
+        self.assertTrue(a.desyncs)
+        self.assertTrue(b.desyncs)
+
+    def test_survivors(self):
+        a, b, links = connect(delay=1)
+        self.assertEqual(a.get_survivors(), None)
+        play(a, b, links, lambda side, tick: ATTACK if side == 0 else 0, 40)
+        self.assertEqual(a.get_survivors(), frozenset(['player']))
+        self.assertEqual(b.get_survivors(), frozenset(['player']))
+
+    def test_ignores_other_packets(self):
+        a, b, links = connect()
+        links[1].send(b'D' + b'\0' * (session.HEADER.size - 1))
+        links[1].send(b'junk')
+        a.advance(0)
+        self.assertEqual(a.remote_inputs, {})
+        self.assertEqual(a.acked, -1)
+
+
+if __name__ == '__main__':
+    unittest.main()
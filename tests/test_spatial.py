@@ -0,0 +1,55 @@
+import math
+import random
+import unittest
+
+from monstermechanics.spatial import SpatialHash
+
+
+def overlaps(a, b):
+    (ax, ay, ar), (bx, by, br) = a, b
+    return math.hypot(ax - bx, ay - by) <= ar + br
+
+
+class SpatialHashTest(unittest.TestCase):
+    def test_query_finds_every_overlapping_circle(self):
+        rng = random.Random(1)
+        circles = [(rng.uniform(-500, 500), rng.uniform(-500, 500), rng.uniform(1, 100))
+                   for i in range(200)]
+        index = SpatialHash(cell_size=64)
+        for i, c in enumerate(circles):
+            index.insert(c[0], c[1], c[2], i)
+
+        for n in range(200):
+            q = rng.uniform(-600, 600), rng.uniform(-600, 600), rng.choice([0, 5, 150])
+            found = set(index.query(*q))
+            expected = set(i for i, c in enumerate(circles) if overlaps(c, q))
+            self.assertTrue(expected <= found, q)
+
+    def test_query_only_looks_at_nearby_cells(self):
+        index = SpatialHash(cell_size=10)
+        index.insert(5, 5, 1, 'near')
+        index.insert(1000, 1000, 1, 'far')
+        self.assertEqual(index.query(4, 4), ['near'])
+        self.assertEqual(index.query(500, 500, 20), [])
+
+    def test_negative_coordinates(self):
+        index = SpatialHash(cell_size=10)
+        index.insert(-5, -5, 1, 'a')
+        self.assertEqual(index.query(-5, -5), ['a'])
+        self.assertEqual(index.query(5, 5), [])
+
+    def test_item_spanning_cells(self):
+        index = SpatialHash(cell_size=10)
+        index.insert(10, 10, 15, 'big')
+        for x, y in [(-4, -4), (24, 24), (-4, 24), (10, 10)]:
+            self.assertEqual(index.query(x, y), ['big'])
+
+    def test_clear(self):
+        index = SpatialHash()
+        index.insert(0, 0, 1, 'a')
+        index.clear()
+        self.assertEqual(index.query(0, 0, 10), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+
+from monstermechanics import timers
+from monstermechanics.timers import Scheduler
+
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.fired = []
+
+    def callback(self, name):
+        def fire():
+            self.fired.append(name)
+        fire.__name__ = name
+        return fire
+
+    def run_for(self, dt):
+        self.scheduler.advance(dt)
+        for callback in self.scheduler.due():
+            callback()
+
+    def test_fires_in_order_of_time(self):
+        s = self.scheduler
+        s.set_timer(self.callback('c'), 3)
+        s.set_timer(self.callback('a'), 1)
+        s.set_timer(self.callback('b'), 2)
+        self.run_for(0.5)
+        self.assertEqual(self.fired, [])
+        self.run_for(5)
+        self.assertEqual(self.fired, ['a', 'b', 'c'])
+        self.assertEqual(len(s), 0)
+
+    def test_equal_times_fire_in_order_set(self):
+        for name in 'xyz':
+            self.scheduler.set_timer(self.callback(name), 1)
+        self.run_for(1)
+        self.assertEqual(self.fired, ['x', 'y', 'z'])
+
+    def test_repeating(self):
+        s = self.scheduler
+        tick = self.callback('tick')
+        s.set_timer(tick, 1, interval=1)
+        self.run_for(3.5)
+        self.assertEqual(self.fired, ['tick'] * 3)
+        self.assertEqual([t.when for t in s.pending()], [4])
+        s.unset_timer(tick)
+        self.run_for(10)
+        self.assertEqual(len(self.fired), 3)
+
+    def test_repeating_needs_positive_interval(self):
+        self.assertRaises(ValueError, self.scheduler.set_timer, self.callback('a'), 1, 0)
+
+    def test_timer_set_by_callback_fires_in_same_pass(self):
+        s = self.scheduler
+        second = self.callback('second')
+
+        def first():
+            self.fired.append('first')
+            s.set_timer(second, 0)
+        s.set_timer(first, 1)
+        self.run_for(1)
+        self.assertEqual(self.fired, ['first', 'second'])
+
+    def test_cancel_is_lazy(self):
+        s = self.scheduler
+        b = self.callback('b')
+        timer = s.set_timer(self.callback('a'), 1)
+        s.set_timer(b, 2)
+        s.cancel(timer)
+        s.cancel(timer)
+        # The cancelled timer stays in the heap until it comes up
+        self.assertEqual(len(s.queue), 2)
+        self.assertEqual(len(s), 1)
+        self.assertEqual([t.callback for t in s.pending()], [b])
+        self.run_for(3)
+        self.assertEqual(self.fired, ['b'])
+        self.assertEqual(s.queue, [])
+        self.assertEqual(s.cancelled, 0)
+
+    def test_unset_timer_cancels_every_timer_for_callback(self):
+        s = self.scheduler
+        a = self.callback('a')
+        s.set_timer(a, 1)
+        s.set_timer(a, 2)
+        s.set_timer(self.callback('b'), 3)
+        s.unset_timer(a)
+        self.assertNotIn(a, s.by_callback)
+        self.run_for(5)
+        self.assertEqual(self.fired, ['b'])
+
+    def test_compacts_when_cancelled_timers_build_up(self):
+        s = self.scheduler
+        n = timers.COMPACT_THRESHOLD
+        live = s.set_timer(self.callback('live'), 100)
+        for i in range(n):
+            s.cancel(s.set_timer(self.callback('dead'), 50))
+        self.assertEqual(s.cancelled, 0)
+        self.assertEqual([e[2] for e in s.queue], [live])
+        self.run_for(100)
+        self.assertEqual(self.fired, ['live'])
+
+    def test_compacting_from_a_callback(self):
+        s = self.scheduler
+        n = timers.COMPACT_THRESHOLD + 6
+        doomed = [s.set_timer(self.callback('dead'), 50) for i in range(n)]
+        tick = self.callback('tick')
+
+        def cancel_all():
+            self.fired.append('cancel_all')
+            for t in doomed:
+                s.cancel(t)
+        s.set_timer(cancel_all, 1)
+        # Due in the same pass, after the heap has been compacted
+        s.set_timer(tick, 1, interval=1)
+
+        self.run_for(1)
+        self.assertEqual(self.fired, ['cancel_all', 'tick'])
+        self.run_for(1)
+        self.assertEqual(self.fired, ['cancel_all', 'tick', 'tick'])
+        self.assertEqual(len(s), len(s.pending()))
+        self.assertEqual(s.cancelled, len(s.queue) - len(s.pending()))
+        self.assertEqual([t.callback for t in s.pending()], [tick])
+
+
+
+if __name__ == '__main__':
+    unittest.main()
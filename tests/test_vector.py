@@ -0,0 +1,121 @@
+import random
+import unittest
+
+from monstermechanics import vector
+from monstermechanics.vector import ListVectorArray, NumpyVectorArray, VectorArray, v
+
+
+def random_points(rng, n):
+    return [v(rng.uniform(-100, 100), rng.uniform(-100, 100)) for i in range(n)]
+
+
+class VectorArrayTestMixin(object):
+    """Checks an implementation of VectorArray against the same operations on Vectors."""
+    cls = None
+
+    def setUp(self):
+        rng = random.Random(5)
+        self.points = random_points(rng, 50)
+        self.others = random_points(rng, 50)
+        self.radii = [rng.uniform(0, 10) for p in self.points]
+        self.array = self.cls(self.points)
+
+    def assertPointsEqual(self, array, expected):
+        array = list(array)
+        self.assertEqual(len(array), len(expected))
+        for p, e in zip(array, expected):
+            self.assertAlmostEqual(p.x, e[0])
+            self.assertAlmostEqual(p.y, e[1])
+
+    def test_sequence(self):
+        self.assertEqual(len(self.array), len(self.points))
+        self.assertPointsEqual(self.array.tolist(), self.points)
+        self.assertPointsEqual([self.array[i] for i in range(len(self.points))], self.points)
+        self.assertTrue(all(isinstance(p, vector.Vector) for p in self.array))
+
+    def test_translate(self):
+        off = v(3, -4)
+        self.assertPointsEqual(self.array + off, [p + off for p in self.points])
+        self.assertPointsEqual(self.array - off, [p - off for p in self.points])
+
+    def test_elementwise(self):
+        other = self.cls(self.others)
+        self.assertPointsEqual(self.array + other, [p + o for p, o in zip(self.points, self.others)])
+        self.assertPointsEqual(self.array - other, [p - o for p, o in zip(self.points, self.others)])
+
+    def test_scale(self):
+        self.assertPointsEqual(self.array * 2.5, [p * 2.5 for p in self.points])
+        self.assertPointsEqual(2.5 * self.array, [p * 2.5 for p in self.points])
+
+    def test_rotated(self):
+        self.assertPointsEqual(self.array.rotated(37), [p.rotated(37) for p in self.points])
+
+    def test_reflected(self):
+        self.assertPointsEqual(self.array.reflected_x(), [v(-p.x, p.y) for p in self.points])
+        self.assertPointsEqual(self.array.reflected_y(), [v(p.x, -p.y) for p in self.points])
+
+    def test_bounds(self):
+        lo, hi = self.array.bounds()
+        self.assertPointsEqual([lo, hi], [
+            (min(p.x for p in self.points), min(p.y for p in self.points)),
+            (max(p.x for p in self.points), max(p.y for p in self.points)),
+        ])
+        lo, hi = self.array.bounds(self.radii)
+        pr = list(zip(self.points, self.radii))
+        self.assertPointsEqual([lo, hi], [
+            (min(p.x - r for p, r in pr), min(p.y - r for p, r in pr)),
+            (max(p.x + r for p, r in pr), max(p.y + r for p, r in pr)),
+        ])
+
+    def test_distance_matrix(self):
+        other = self.cls(self.others)
+        m = self.array.distance_matrix(other)
+        for i, p in enumerate(self.points):
+            for j, o in enumerate(self.others):
+                self.assertAlmostEqual(m[i][j], p.distance_to(o))
+
+
+class ListVectorArrayTest(VectorArrayTestMixin, unittest.TestCase):
+    cls = ListVectorArray
+
+
+@unittest.skipIf(vector.numpy is None, "NumPy is not installed")
+class NumpyVectorArrayTest(VectorArrayTestMixin, unittest.TestCase):
+    cls = NumpyVectorArray
+
+    def test_parity_with_list(self):
+        """Both implementations give the same results, so either can be picked."""
+        a = ListVectorArray(self.points)
+        b = NumpyVectorArray(self.points)
+        off = v(1, 2)
+        for f in [
+                lambda x: x + off,
+                lambda x: (x * 3).rotated(-20),
+                lambda x: x.reflected_x() - off]:
+            self.assertPointsEqual(f(b), f(a).tolist())
+        self.assertPointsEqual(b.bounds(self.radii), a.bounds(self.radii))
+
+
+class VectorArrayFactoryTest(unittest.TestCase):
+    def test_small_arrays_stay_in_python(self):
+        small = [v(i, i) for i in range(vector.NUMPY_THRESHOLD - 1)]
+        self.assertIsInstance(VectorArray(small), ListVectorArray)
+
+    @unittest.skipIf(vector.numpy is None, "NumPy is not installed")
+    def test_large_arrays_use_numpy(self):
+        large = [v(i, i) for i in range(vector.NUMPY_THRESHOLD)]
+        self.assertIsInstance(VectorArray(large), NumpyVectorArray)
+        self.assertIsInstance(VectorArray(vector.numpy.zeros((2, 2))), NumpyVectorArray)
+
+    def test_without_numpy(self):
+        numpy = vector.numpy
+        vector.numpy = None
+        try:
+            large = [v(i, i) for i in range(vector.NUMPY_THRESHOLD * 2)]
+            self.assertIsInstance(VectorArray(large), ListVectorArray)
+        finally:
+            vector.numpy = numpy
+
+
+if __name__ == '__main__':
+    unittest.main()
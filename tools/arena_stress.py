@@ -0,0 +1,110 @@
+#!/usr/bin/python
+"""Stress test for arenas with many monsters.
+
+Fills an arena with copies of the enemy designs, split between several AI
+controlled teams, and reports how long the world takes to step as the number
+of monsters grows::
+
+    python tools/arena_stress.py --teams 4 --counts 2,10,25,50,100
+
+With --arenas, it instead runs that many independent one-on-one fights side
+by side in the one process, and reports the throughput of each.
+
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Sets up the pyglet resource path
+import monstermechanics.__main__
+from monstermechanics.world import World
+from monstermechanics.monster import Monster
+from monstermechanics.controller import AIController
+from monstermechanics.physics import TEAMS
+from monstermechanics.arena import Arena, ArenaManager, translated, DT
+
+SPACING = 150
+# Monsters are packed closer together than SPACING if need be to keep them
+# inside the physics world
+ARENA_WIDTH = 4000
+ENEMY_DIR = 'data/enemies'
+
+
+def load_designs():
+    designs = []
+    for f in sorted(os.listdir(ENEMY_DIR)):
+        with open(os.path.join(ENEMY_DIR, f)) as fp:
+            designs.append(json.load(fp))
+    return designs
+
+
+def populate(count, teams, designs):
+    """Return a World with count monsters, split between teams."""
+    world = World()
+    spacing = min(SPACING, ARENA_WIDTH / count)
+    for i in range(count):
+        team = teams[i % len(teams)]
+        x = (i - count * 0.5) * spacing
+        m = Monster.from_json(world, translated(designs[i % len(designs)], x), team)
+        m.set_controller(AIController(world, m, team))
+        world.add_monster(m)
+    return world
+
+
+def measure(world, ticks):
+    """Return the mean and worst step times in milliseconds."""
+    times = []
+    for i in range(ticks):
+        start = time.time()
+        world.update(DT)
+        times.append(time.time() - start)
+    return sum(times) / len(times) * 1000, max(times) * 1000
+
+
+def run_arenas(count, designs):
+    """Run count one-on-one fights side by side and print their throughput."""
+    manager = ArenaManager()
+    for i in range(count):
+        arena = Arena('arena%d' % i, seed=i)
+        arena.add_monster(designs[i % len(designs)], -200, TEAMS[0])
+        arena.add_monster(designs[(i + 1) % len(designs)], 200, TEAMS[1])
+        manager.add(arena)
+    rate = manager.run()
+    for line in manager.report():
+        print(line)
+    print('Total: %.0f ticks/s' % rate)
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--teams', type='int', default=2,
+        help='number of teams, at most %d' % len(TEAMS))
+    parser.add_option('--counts', default='2,10,25,50,100',
+        help='comma separated numbers of monsters to try')
+    parser.add_option('--ticks', type='int', default=300,
+        help='number of ticks to step each arena')
+    parser.add_option('--arenas', type='int',
+        help='run this many independent fights instead')
+    options, args = parser.parse_args()
+    if not 1 < options.teams <= len(TEAMS):
+        parser.error('--teams must be between 2 and %d' % len(TEAMS))
+
+    Monster.load_all()
+    designs = load_designs()
+    if options.arenas:
+        run_arenas(options.arenas, designs)
+        sys.exit()
+    teams = TEAMS[:options.teams]
+    print('%8s %10s %10s %10s %10s' % ('monsters', 'mean ms', 'worst ms', 'alive', 'asleep'))
+    for count in [int(c) for c in options.counts.split(',')]:
+        world = populate(count, teams, designs)
+        mean, worst = measure(world, options.ticks)
+        stats = world.get_stats()
+        print('%8d %10.2f %10.2f %10d %9.0f%%' % (count, mean, worst, stats['monsters'], stats['sleeping'] * 100))
@@ -0,0 +1,255 @@
+#!/usr/bin/python
+"""Microbenchmarks for the vector and geometry types.
+
+Times the common operations on vector.Vector and vec2d.Vec2d, plus the
+rectangle types, and weights them by how often each operation is performed
+in a fight to estimate which representation is cheaper for the game overall.
+
+The built-in weights are estimated from the hot paths (Monster.colliding,
+Camera and the Box2D conversions). For weights measured from a real fight,
+profile a recording made with ``run_game.py --record``::
+
+    python tools/vector_benchmark.py --profile match.mmr --save-pattern fight.json
+    python tools/vector_benchmark.py --pattern fight.json
+
+With ``--arrays``, the two VectorArray implementations are compared instead,
+over arrays of increasing size, to check vector.NUMPY_THRESHOLD.
+
+"""
+from __future__ import division, print_function
+
+import os
+import sys
+import json
+import random
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from monstermechanics import vector
+from monstermechanics.vec2d import Vec2d
+from monstermechanics.geom import Rect
+
+
+# Relative frequency of each operation in a fight
+DEFAULT_PATTERN = {
+    'construct': 30,
+    'add': 25,
+    'sub': 20,
+    'scale': 12,
+    'div': 6,
+    'length2': 10,
+    'length': 3,
+    'rotate': 2,
+    'union': 2,
+}
+
+# Number of sample points the operations are timed over
+SAMPLES = 1000
+
+
+def sample_coords(n=SAMPLES, seed=0):
+    """Coordinates spread over a typical arena."""
+    rnd = random.Random(seed)
+    return [(rnd.uniform(0, 1500), rnd.uniform(0, 500)) for i in range(n)]
+
+
+class VectorLib(object):
+    name = 'vector.Vector'
+    make = staticmethod(vector.v)
+
+    @staticmethod
+    def length(a):
+        return a.length
+
+    @staticmethod
+    def length2(a):
+        return a.length2
+
+
+class Vec2dLib(object):
+    name = 'vec2d.Vec2d'
+    make = Vec2d
+
+    @staticmethod
+    def length(a):
+        return a.length
+
+    @staticmethod
+    def length2(a):
+        return a.get_length_sqrd()
+
+
+LIBS = [VectorLib, Vec2dLib]
+
+
+def make_ops(lib, coords):
+    """Return a dict of operation name to a function performing it SAMPLES times."""
+    make = lib.make
+    length = lib.length
+    length2 = lib.length2
+    pts = [make(x, y) for x, y in coords]
+    pairs = list(zip(pts, pts[1:] + pts[:1]))
+    rects = [Rect(a, a + make(10, -10)) for a in pts]
+    rect_pairs = list(zip(rects, rects[1:] + rects[:1]))
+
+    return {
+        'construct': lambda: [make(x, y) for x, y in coords],
+        'add': lambda: [a + b for a, b in pairs],
+        'sub': lambda: [a - b for a, b in pairs],
+        'scale': lambda: [a * 0.5 for a in pts],
+        'div': lambda: [a / 0.01 for a in pts],
+        'length': lambda: [length(a - b) for a, b in pairs],
+        'length2': lambda: [length2(a - b) for a, b in pairs],
+        'rotate': lambda: [a.rotated(30) for a in pts],
+        'union': lambda: [r1.union(r2) for r1, r2 in rect_pairs],
+    }
+
+
+def time_ops(lib, coords, repeat=3, number=20):
+    """Return a dict of operation name to nanoseconds per operation."""
+    results = {}
+    for name, f in make_ops(lib, coords).items():
+        t = min(timeit.repeat(f, repeat=repeat, number=number))
+        results[name] = t / (number * len(coords)) * 1e9
+    return results
+
+
+# Array sizes compared by --arrays
+ARRAY_SIZES = [2, 4, 8, 16, 32, 64, 128, 256]
+
+
+def time_arrays(sizes=ARRAY_SIZES, repeat=3, number=2000):
+    """Time transforming and bounding arrays of circles with each VectorArray.
+
+    Returns a list of (size, pure Python ns, NumPy ns) per array, as done for
+    the bounds of a body part.
+
+    """
+    results = []
+    for n in sizes:
+        coords = sample_coords(n)
+        radii = [10.0] * n
+        row = [n]
+        for cls in (vector.ListVectorArray, vector.NumpyVectorArray):
+            def f():
+                a = cls(coords).rotated(30) + vector.v(100, 50)
+                a.bounds(radii)
+            t = min(timeit.repeat(f, repeat=repeat, number=number))
+            row.append(t / number * 1e9)
+        results.append(tuple(row))
+    return results
+
+
+def report_arrays(results):
+    print('%6s %14s %14s' % ('size', 'pure Python', 'NumPy'))
+    for n, pure, numpy in results:
+        print('%6d %11.0f ns %11.0f ns' % (n, pure, numpy))
+    faster = [n for n, pure, numpy in results if numpy < pure]
+    print()
+    if faster:
+        print('NumPy is faster from %d vectors; NUMPY_THRESHOLD is %d.' % (faster[0], vector.NUMPY_THRESHOLD))
+    else:
+        print('NumPy was never faster; NUMPY_THRESHOLD is %d.' % vector.NUMPY_THRESHOLD)
+
+
+def profile_replay(path):
+    """Count the vector operations performed while playing back a recording."""
+    import monstermechanics.__main__
+    from monstermechanics.playback import Playback
+    from monstermechanics import geom
+
+    counts = dict((k, 0) for k in DEFAULT_PATTERN)
+
+    def counted(name, f):
+        def wrapper(*args, **kwargs):
+            counts[name] += 1
+            return f(*args, **kwargs)
+        return wrapper
+
+    V = vector.Vector
+    patches = [
+        (V, '__add__', 'add'),
+        (V, '__radd__', 'add'),
+        (V, '__sub__', 'sub'),
+        (V, '__rsub__', 'sub'),
+        (V, '__mul__', 'scale'),
+        (V, '__rmul__', 'scale'),
+        (V, '__div__', 'div'),
+        (V, '__truediv__', 'div'),
+        (V, 'rotated', 'rotate'),
+        (geom.Rect, 'union', 'union'),
+    ]
+    props = [(V, 'length', 'length'), (V, 'length2', 'length2')]
+
+    def new(cls, *args):
+        counts['construct'] += 1
+        return tuple.__new__(cls, *args)
+
+    originals = [(obj, attr, obj.__dict__[attr]) for obj, attr, op in patches + props]
+    try:
+        # Every operation returning a vector constructs one, so count them all
+        V.__new__ = staticmethod(new)
+        for obj, attr, op in patches:
+            setattr(obj, attr, counted(op, getattr(obj, attr)))
+        for obj, attr, op in props:
+            setattr(obj, attr, property(counted(op, obj.__dict__[attr].fget)))
+        Playback.open(path).run()
+    finally:
+        del V.__new__
+        for obj, attr, orig in originals:
+            setattr(obj, attr, orig)
+    return counts
+
+
+def report(pattern, results):
+    ops = sorted(pattern, key=lambda k: -pattern[k])
+    names = [lib.name for lib in LIBS]
+    print('%-10s %8s ' % ('operation', 'weight') + ' '.join('%14s' % n for n in names))
+    for op in ops:
+        print('%-10s %8s ' % (op, pattern[op]) + ' '.join('%11.0f ns' % results[n][op] for n in names))
+
+    total = sum(pattern.values())
+    print()
+    print('Weighted mean cost per operation:')
+    for n in names:
+        cost = sum(pattern[op] * results[n][op] for op in ops) / total
+        print('  %-14s %6.0f ns' % (n, cost))
+
+
+if __name__ == '__main__':
+    from optparse import OptionParser
+
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--profile', metavar='REPLAY',
+        help='measure the operation mix by playing back the recording REPLAY')
+    parser.add_option('--pattern', metavar='FILE',
+        help='load the operation mix from FILE')
+    parser.add_option('--save-pattern', metavar='FILE',
+        help='save the operation mix to FILE')
+    parser.add_option('--arrays', action='store_true',
+        help='compare the VectorArray implementations by array size')
+
+    options, args = parser.parse_args()
+
+    if options.arrays:
+        if vector.numpy is None:
+            parser.error('--arrays needs NumPy')
+        report_arrays(time_arrays())
+        sys.exit(0)
+
+    pattern = DEFAULT_PATTERN
+    if options.pattern:
+        with open(options.pattern) as f:
+            pattern = json.load(f)
+    if options.profile:
+        pattern = profile_replay(options.profile)
+    if options.save_pattern:
+        with open(options.save_pattern, 'w') as f:
+            json.dump(pattern, f, indent=2)
+
+    coords = sample_coords()
+    results = {}
+    for lib in LIBS:
+        results[lib.name] = time_ops(lib, coords)
+    report(pattern, results)